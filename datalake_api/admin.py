@@ -1,7 +1,8 @@
 from django.contrib import admin
-from .models import DataLakeResource, PermissionEntry, AuditLog, VersionEntry
+from .models import DataLakeResource, PermissionEntry, AuditLog, VersionEntry, ExportJob
 
 admin.site.register(DataLakeResource)
 admin.site.register(PermissionEntry)
 admin.site.register(AuditLog)
 admin.site.register(VersionEntry)
+admin.site.register(ExportJob)
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 class DatalakeApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'datalake_api'
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
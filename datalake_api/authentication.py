@@ -0,0 +1,108 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
+from collections import OrderedDict
+import time
+import threading
+
+from .checks import shared_cache_configured
+from .permissions import permission_version
+
+User = get_user_model()
+
+PERMISSION_VERSION_CLAIM = 'perm_version'
+
+
+class DataLakeTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Ajoute au jeton l'identité, is_superuser et la version des permissions"""
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token['username'] = user.get_username()
+        token['is_superuser'] = user.is_superuser
+        token['is_staff'] = user.is_staff
+        token[PERMISSION_VERSION_CLAIM] = permission_version(user.pk)
+        return token
+
+
+class UserCache:
+    """Petit cache LRU en mémoire de processus, avec durée de vie"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user
+
+    def set(self, key, user):
+        with self._lock:
+            self._entries[key] = (user, time.monotonic() + settings.DATALAKE_AUTH_USER_CACHE_TTL)
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.DATALAKE_AUTH_USER_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def discard_user(self, user_id):
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == user_id]:
+                del self._entries[key]
+
+
+user_cache = UserCache()
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """Authentification JWT sans requête SQL en régime établi
+
+    Si la version de permissions du jeton correspond à la version courante (lue dans le
+    cache partagé), l'utilisateur est reconstruit à partir des claims signées et gardé
+    dans un cache de processus. Sinon, ou pour un jeton sans ces claims, l'utilisateur
+    est relu en base comme avec JWTAuthentication.
+
+    Les invalidations passent par le cache Django, qui doit être partagé (Redis,
+    Memcached, base de données) : avec un cache propre au processus, une rétrogradation
+    ou une désactivation n'atteindrait qu'un worker, donc l'utilisateur est relu en base.
+    """
+
+    def get_user(self, validated_token):
+        if not settings.DATALAKE_STATELESS_AUTH or not shared_cache_configured():
+            return super().get_user(validated_token)
+
+        token_version = validated_token.get(PERMISSION_VERSION_CLAIM)
+        if token_version is None or 'is_superuser' not in validated_token:
+            return super().get_user(validated_token)
+
+        user_id = User._meta.pk.to_python(validated_token[api_settings.USER_ID_CLAIM])
+        current = permission_version(user_id)
+        key = (user_id, current)
+
+        user = user_cache.get(key)
+        if user is not None:
+            return user
+
+        if token_version != current:
+            # Droits modifiés depuis l'émission du jeton : relire l'utilisateur en base
+            user = super().get_user(validated_token)
+        else:
+            # Instance jamais sauvegardée : seules les clés étrangères utilisent son pk
+            user = User(
+                pk=user_id,
+                is_superuser=validated_token['is_superuser'],
+                is_staff=validated_token.get('is_staff', False),
+                is_active=True,
+            )
+            setattr(user, User.USERNAME_FIELD, validated_token.get('username', ''))
+        user_cache.set(key, user)
+        return user
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+# Backends dont le contenu reste propre à chaque processus : une invalidation n'y atteint qu'un worker
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def shared_cache_configured():
+    """Vrai si le cache par défaut est commun à tous les processus"""
+    return settings.CACHES['default']['BACKEND'] not in LOCAL_CACHE_BACKENDS
+
+
+@register()
+def check_stateless_auth_cache(app_configs, **kwargs):
+    if settings.DATALAKE_STATELESS_AUTH and not shared_cache_configured():
+        return [Error(
+            'DATALAKE_STATELESS_AUTH requires a cache shared between processes.',
+            hint='Set REDIS_URL (or configure a shared default cache), or disable DATALAKE_STATELESS_AUTH.',
+            id='datalake_api.E001',
+        )]
+    return []
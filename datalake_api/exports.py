@@ -0,0 +1,464 @@
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+import os
+import json
+import time
+import datetime
+import random
+import shutil
+import logging
+import tempfile
+import itertools
+import threading
+import importlib.util
+import multiprocessing
+
+from .partitions import FolderScan
+from .query import filter_records, parse_projection
+from .readers import RecordReader
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('ndjson', 'parquet')
+SAMPLING_METHODS = ('reservoir', 'stratified')
+SPLITS = ('train', 'validation')
+
+
+def parquet_available():
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+# ==========================================
+# SPÉCIFICATION
+# ==========================================
+
+def _number(data, key, default, cast):
+    try:
+        return cast(data.get(key, default))
+    except (TypeError, ValueError):
+        raise ValueError('%s doit être numérique' % key)
+
+
+def parse_export_spec(data):
+    """Valider le corps de la requête ; lève ValueError avec un message lisible"""
+    paths = data.get('paths') or data.get('path') or []
+    if isinstance(paths, str):
+        paths = [paths]
+    if not isinstance(paths, list):
+        raise ValueError('"paths" doit être une liste de chemins')
+    paths = [str(p).strip().strip('/') for p in paths]
+    if not paths or not all(paths):
+        raise ValueError('Paramètre "paths" requis')
+
+    filters = data.get('filters') or None
+    if filters is not None and not isinstance(filters, dict):
+        raise ValueError('"filters" doit être un objet JSON')
+
+    projection = data.get('projection') or None
+    if isinstance(projection, str):
+        projection = parse_projection(projection)
+    elif projection is not None and not isinstance(projection, list):
+        raise ValueError('"projection" doit être une liste de champs')
+
+    sample = data.get('sample') or None
+    if sample is not None:
+        if not isinstance(sample, dict) or sample.get('method') not in SAMPLING_METHODS:
+            raise ValueError('sample.method doit valoir reservoir ou stratified')
+        size = _number(sample, 'size', 0, int)
+        if not 1 <= size <= settings.DATALAKE_EXPORT_MAX_SAMPLE_ROWS:
+            raise ValueError('sample.size doit être entre 1 et %d' % settings.DATALAKE_EXPORT_MAX_SAMPLE_ROWS)
+        if sample['method'] == 'stratified' and not sample.get('column'):
+            raise ValueError('sample.column requis pour un échantillonnage stratifié')
+        sample = {'method': sample['method'], 'size': size, 'column': sample.get('column')}
+
+    validation = _number(data, 'validation_split', 0, float)
+    if not 0 <= validation < 1:
+        raise ValueError('validation_split doit être dans [0, 1[')
+
+    fmt = data.get('format', 'ndjson')
+    if fmt not in FORMATS:
+        raise ValueError('format doit valoir ndjson ou parquet')
+    if fmt == 'parquet' and not parquet_available():
+        raise ValueError('Le format parquet nécessite pyarrow')
+
+    shard_rows = _number(data, 'shard_rows', settings.DATALAKE_EXPORT_SHARD_ROWS, int)
+    if not 1 <= shard_rows <= settings.DATALAKE_EXPORT_MAX_SHARD_ROWS:
+        raise ValueError('shard_rows doit être entre 1 et %d' % settings.DATALAKE_EXPORT_MAX_SHARD_ROWS)
+
+    return {
+        'paths': paths,
+        'filters': filters,
+        'projection': projection,
+        'sample': sample,
+        'seed': _number(data, 'seed', 0, int),
+        'shuffle': str(data.get('shuffle', True)).lower() != 'false',
+        'validation_split': validation,
+        'format': fmt,
+        'shard_rows': shard_rows,
+    }
+
+
+# ==========================================
+# ÉCHANTILLONNAGE ET MÉLANGE
+# ==========================================
+
+def reservoir_sample(records, size, rng):
+    """Algorithme R : échantillon uniforme de `size` lignes, dans l'ordre d'origine"""
+    reservoir = []
+    for index, record in enumerate(records):
+        if index < size:
+            reservoir.append((index, record))
+        else:
+            j = rng.randrange(index + 1)
+            if j < size:
+                reservoir[j] = (index, record)
+    reservoir.sort(key=lambda item: item[0])
+    return [record for _, record in reservoir]
+
+
+def stratified_sample(records, column, size, rng):
+    """Un réservoir de `size` lignes par valeur de `column`, dans l'ordre d'origine
+
+    Le total conservé, toutes strates confondues, est borné par DATALAKE_EXPORT_MAX_SAMPLE_ROWS.
+    """
+    limit = settings.DATALAKE_EXPORT_MAX_SAMPLE_ROWS
+    strata = {}
+    kept = 0
+    for index, record in enumerate(records):
+        value = record.get(column) if isinstance(record, dict) else None
+        key = json.dumps(value, sort_keys=True, default=str)
+        stratum = strata.get(key)
+        if stratum is None:
+            if len(strata) >= settings.DATALAKE_EXPORT_MAX_STRATA:
+                raise ValueError('Plus de %d strates pour %s' % (settings.DATALAKE_EXPORT_MAX_STRATA, column))
+            stratum = strata[key] = [0, []]
+        seen, items = stratum
+        if seen < size:
+            kept += 1
+            if kept > limit:
+                raise ValueError('Échantillon stratifié de plus de %d lignes (%d strates) : réduisez sample.size'
+                                 % (limit, len(strata)))
+            items.append((index, record))
+        else:
+            j = rng.randrange(seen + 1)
+            if j < size:
+                items[j] = (index, record)
+        stratum[0] = seen + 1
+    merged = sorted((item for _, items in strata.values() for item in items), key=lambda item: item[0])
+    return [record for _, record in merged]
+
+
+def _read_lines(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def bucket_shuffle(records, rng, directory, buckets, max_rows):
+    """Mélange en mémoire bornée par `max_rows`
+
+    Un flux qui tient en mémoire est mélangé directement. Sinon chaque ligne part dans un
+    seau tiré au hasard sur disque, puis chaque seau est mélangé à son tour (récursivement
+    s'il dépasse encore `max_rows`).
+    """
+    records = iter(records)
+    head = list(itertools.islice(records, max_rows + 1))
+    if len(head) <= max_rows:
+        rng.shuffle(head)
+        yield from head
+        return
+
+    paths, files = [], []
+    try:
+        for _ in range(buckets):
+            fd, path = tempfile.mkstemp(suffix='.bucket', dir=directory)
+            paths.append(path)
+            files.append(os.fdopen(fd, 'w', encoding='utf-8'))
+        for record in itertools.chain(head, records):
+            files[rng.randrange(buckets)].write(json.dumps(record, default=str) + '\n')
+        del head
+        for f in files:
+            f.close()
+        for path in paths:
+            yield from bucket_shuffle(_read_lines(path), rng, directory, buckets, max_rows)
+            os.remove(path)
+    finally:
+        for f in files:
+            f.close()
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+# ==========================================
+# ÉCRITURE DES FRAGMENTS (processus du pool)
+# ==========================================
+
+def _write_parquet(path, records):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columns = {}
+    for record in records:
+        for field in record:
+            columns.setdefault(field, None)
+    arrays = {}
+    for field in columns:
+        values = [record.get(field) for record in records]
+        try:
+            arrays[field] = pa.array(values)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Colonne de types mélangés : stockée en texte
+            arrays[field] = pa.array([
+                v if v is None or isinstance(v, str) else json.dumps(v, default=str) for v in values
+            ])
+    pq.write_table(pa.table(arrays), path)
+
+
+def write_shard(path, records, fmt):
+    """Encoder et écrire un fragment ; retourne (chemin, lignes, octets)"""
+    tmp = path + '.tmp'
+    if fmt == 'parquet':
+        _write_parquet(tmp, records)
+    else:
+        with open(tmp, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, default=str) + '\n')
+    os.replace(tmp, path)
+    return path, len(records), os.path.getsize(path)
+
+
+# ==========================================
+# EXÉCUTION D'UN JOB
+# ==========================================
+
+class ExportRunner:
+    """Lecture, filtrage, échantillonnage, mélange et écriture en fragments d'un ExportJob
+
+    Le flux n'est matérialisé que pour l'échantillonnage (borné par sample.size) ; sans
+    échantillon, le mélange passe par des seaux sur disque. Le processus principal garde
+    au plus un fragment par split et 2 fragments par processus d'écriture en vol.
+    """
+
+    def __init__(self, job):
+        self.job = job
+        self.spec = job.spec
+        self.base_path = Path(settings.DATA_LAKE_ROOT).resolve()
+        self._scanned_done = 0
+        self._reader = None
+        self._reported = 0.0
+        self.rows_selected = 0
+        self.rows_written = 0
+        self.files = []
+
+    @property
+    def rows_scanned(self):
+        return self._scanned_done + (self._reader.rows_scanned if self._reader else 0)
+
+    def run(self):
+        job = self.job
+        job.started_at = timezone.now()
+        # Un job déclaré orphelin pendant son attente dans la file n'est plus exécuté
+        claimed = type(job).objects.filter(pk=job.pk, status=job.PENDING).update(
+            status=job.RUNNING, started_at=job.started_at
+        )
+        if not claimed:
+            return
+        job.status = job.RUNNING
+        try:
+            os.makedirs(job.output_dir, exist_ok=True)
+            self._export()
+            job.status = job.DONE
+        except Exception as e:
+            logger.exception('Export %s failed', job.pk)
+            job.status = job.FAILED
+            job.error = str(e)
+            shutil.rmtree(job.output_dir, ignore_errors=True)
+        job.rows_scanned = self.rows_scanned
+        job.rows_selected = self.rows_selected
+        job.rows_written = self.rows_written
+        job.files = sorted(self.files, key=lambda f: (SPLITS.index(f['split']), f['path']))
+        job.finished_at = timezone.now()
+        job.save()
+        if job.status == job.DONE:
+            self._write_manifest()
+
+    def _source(self):
+        filters = self.spec['filters']
+        for path in self.spec['paths']:
+            full_path = (self.base_path / path).resolve()
+            if full_path.is_dir():
+                reader = FolderScan(full_path, self.base_path, filters)
+            else:
+                reader = RecordReader(full_path)
+            self._reader = reader
+            try:
+                for record in filter_records(iter(reader), filters):
+                    self.rows_selected += 1
+                    yield record
+            finally:
+                self._scanned_done += reader.rows_scanned
+                self._reader = None
+
+    def _export(self):
+        spec = self.spec
+        rng = random.Random(spec['seed'])
+        records = self._source()
+
+        sample = spec['sample']
+        if sample:
+            if sample['method'] == 'stratified':
+                records = stratified_sample(records, sample['column'], sample['size'], rng)
+            else:
+                records = reservoir_sample(records, sample['size'], rng)
+            self._report(force=True)
+
+        fields = spec['projection']
+        if fields:
+            fields = set(fields)
+            records = ({k: v for k, v in item.items() if k in fields} for item in records)
+
+        if spec['shuffle']:
+            scratch = os.path.join(self.job.output_dir, '.shuffle')
+            os.makedirs(scratch, exist_ok=True)
+            records = bucket_shuffle(
+                records, rng, scratch,
+                settings.DATALAKE_EXPORT_SHUFFLE_BUCKETS, settings.DATALAKE_EXPORT_SHUFFLE_MEMORY_ROWS
+            )
+
+        self._write(records)
+        shutil.rmtree(os.path.join(self.job.output_dir, '.shuffle'), ignore_errors=True)
+
+    def _write(self, records):
+        spec = self.spec
+        validation = spec['validation_split']
+        split_rng = random.Random('%s:split' % spec['seed'])
+        workers = settings.DATALAKE_EXPORT_WRITER_PROCESSES
+        suffix = 'parquet' if spec['format'] == 'parquet' else 'ndjson'
+        shards = {split: [] for split in SPLITS}
+        counters = {split: 0 for split in SPLITS}
+        pending = set()
+
+        def collect(done):
+            for future in done:
+                path, rows, size = future.result()
+                split = os.path.basename(os.path.dirname(path))
+                self.files.append({
+                    'split': split,
+                    'path': os.path.relpath(path, self.job.output_dir),
+                    'rows': rows,
+                    'bytes': size,
+                })
+                self.rows_written += rows
+
+        def submit(split):
+            nonlocal pending
+            while len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            directory = os.path.join(self.job.output_dir, split)
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, 'part-%05d.%s' % (counters[split], suffix))
+            counters[split] += 1
+            pending.add(pool.submit(write_shard, path, shards[split], spec['format']))
+            shards[split] = []
+
+        # spawn : pas de fork d'un processus serveur multi-thread
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            for record in records:
+                split = 'validation' if validation and split_rng.random() < validation else 'train'
+                shards[split].append(record)
+                if len(shards[split]) >= spec['shard_rows']:
+                    submit(split)
+                self._report()
+            for split in SPLITS:
+                if shards[split]:
+                    submit(split)
+            collect(wait(pending).done)
+
+    def _report(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._reported < settings.DATALAKE_EXPORT_PROGRESS_INTERVAL:
+            return
+        self._reported = now
+        type(self.job).objects.filter(pk=self.job.pk).update(
+            rows_scanned=self.rows_scanned,
+            rows_selected=self.rows_selected,
+            rows_written=self.rows_written,
+        )
+
+    def _write_manifest(self):
+        job = self.job
+        manifest = {
+            'job_id': str(job.pk),
+            'spec': job.spec,
+            'rows_scanned': job.rows_scanned,
+            'rows_selected': job.rows_selected,
+            'rows_written': job.rows_written,
+            'files': job.files,
+        }
+        with open(os.path.join(job.output_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+
+
+def run_export(job_id):
+    from .models import ExportJob
+    try:
+        ExportRunner(ExportJob.objects.get(pk=job_id)).run()
+    finally:
+        with _executor_lock:
+            _held.discard(job_id)
+        connection.close()
+
+
+# Jobs en file ou en cours dans ce processus : leur heartbeat_at est rafraîchi
+# périodiquement, un job dont le heartbeat s'arrête a perdu son processus.
+_executor = None
+_executor_lock = threading.Lock()
+_held = set()
+
+
+def _heartbeat():
+    from .models import ExportJob
+    while True:
+        time.sleep(settings.DATALAKE_EXPORT_HEARTBEAT_INTERVAL)
+        with _executor_lock:
+            held = list(_held)
+        if not held:
+            continue
+        try:
+            ExportJob.objects.filter(pk__in=held).update(heartbeat_at=timezone.now())
+        except Exception:
+            logger.exception('Export heartbeat failed')
+        finally:
+            connection.close()
+
+
+def submit_export(job):
+    """Lancer le job dans un thread de fond une fois la transaction validée"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.DATALAKE_EXPORT_MAX_JOBS, thread_name_prefix='export'
+            )
+            threading.Thread(target=_heartbeat, name='export-heartbeat', daemon=True).start()
+        _held.add(job.pk)
+    transaction.on_commit(lambda: _executor.submit(run_export, job.pk))
+
+
+def fail_orphaned_jobs(jobs):
+    """Marquer en échec les jobs actifs dont le processus a disparu (redémarrage, crash)"""
+    from .models import ExportJob
+    stale = timezone.now() - datetime.timedelta(seconds=settings.DATALAKE_EXPORT_STALE_AFTER)
+    return jobs.filter(
+        status__in=[ExportJob.PENDING, ExportJob.RUNNING], heartbeat_at__lt=stale
+    ).update(
+        status=ExportJob.FAILED,
+        error='Interrompu : le processus qui exécutait le job s\'est arrêté',
+        finished_at=timezone.now(),
+    )
@@ -0,0 +1,250 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from rest_framework.test import APIClient
+from datalake_api.models import PermissionEntry
+from datalake_api.management.commands.repush_transaction import find_transaction
+import os, sys, json, math, time, random, resource, platform, subprocess, datetime
+import django
+
+User = get_user_model()
+
+
+def percentile(sorted_values, pct):
+    """Percentile par rang le plus proche sur une liste déjà triée"""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+class Command(BaseCommand):
+    help = 'Run the data lake benchmark suite and report latency, throughput and peak RSS as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--user', type=str, default='bench_admin',
+                            help='User issuing the read requests')
+        parser.add_argument('--only', type=str, default='',
+                            help='Comma separated list of scenario names to run')
+        parser.add_argument('--output', type=str, default=None,
+                            help='Write the JSON report to this file instead of stdout')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--root', type=str, default=None,
+                            help='Data lake served during the run (defaults to settings.DATA_LAKE_ROOT)')
+
+    def handle(self, *args, **options):
+        try:
+            self.user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError('user %s not found, run generate_datalake first' % options['user'])
+
+        self.root = os.path.abspath(options['root'] or settings.DATA_LAKE_ROOT)
+        # L'API lit DATA_LAKE_ROOT à chaque requête : on la fait servir le data lake généré
+        with override_settings(DATA_LAKE_ROOT=self.root):
+            self._run(options)
+
+    def _run(self, options):
+        self.rng = random.Random(options['seed'])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.files = self._discover_files(self.root)
+        if not self.files:
+            raise CommandError('no data files under %s, run generate_datalake first' % self.root)
+
+        scenarios = self._build_scenarios()
+        only = {s.strip() for s in options['only'].split(',') if s.strip()}
+        if only:
+            scenarios = [s for s in scenarios if s[0] in only]
+
+        results = {}
+        for name, run in scenarios:
+            results[name] = self._measure(run, options['iterations'], options['warmup'])
+            self.stderr.write('%-28s p50=%.2fms p99=%.2fms %.1f req/s' % (
+                name, results[name]['p50_ms'], results[name]['p99_ms'], results[name]['throughput_rps']
+            ))
+
+        report = {
+            'commit': self._git_commit(),
+            'timestamp': datetime.datetime.utcnow().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'data_lake_root': self.root,
+            'files': len(self.files),
+            'iterations': options['iterations'],
+            'peak_rss_kb': self._peak_rss_kb(),
+            'scenarios': results,
+        }
+        payload = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(payload)
+        else:
+            self.stdout.write(payload)
+
+    # ------------------------------------------
+    # Scénarios
+    # ------------------------------------------
+
+    def _build_scenarios(self):
+        by_format = {}
+        for rel in self.files:
+            by_format.setdefault(rel.rsplit('.', 1)[-1], rel)
+        topic = self.files[0].split('/')[0]
+        txid = self._sample_transaction_id()
+
+        scenarios = []
+        for fmt, rel in sorted(by_format.items()):
+            scenarios += [
+                ('data_%s_offset_0' % fmt, self._get('/api/data/', {'path': rel})),
+                ('data_%s_offset_mid' % fmt, self._get('/api/data/', {'path': rel, 'offset': 500, 'limit': 100})),
+                ('data_%s_offset_deep' % fmt, self._get('/api/data/', {'path': rel, 'offset': 100000, 'limit': 100})),
+                ('data_%s_filters' % fmt, self._get('/api/data/', {
+                    'path': rel,
+                    'filters': json.dumps({'amount': {'gt': 1500}, 'country': 'FR'}),
+                })),
+                ('data_%s_projection' % fmt, self._get('/api/data/', {
+                    'path': rel, 'projection': 'transaction_id,amount', 'limit': 100,
+                })),
+            ]
+
+        scenarios += [
+            ('browse_root', self._get('/api/data/', {'browse': 'true'})),
+            ('browse_topic', self._get('/api/data/', {'browse': 'true', 'path': topic})),
+            ('search', self._get('/api/search/', {'query': 'part-0000'})),
+            ('grant_revoke', self._grant_revoke(topic)),
+        ]
+
+        partitioned = sorted({f.split('/date=')[0] for f in self.files if '/date=' in f})
+        if partitioned:
+            dates = sorted({f.split('date=')[1].split('/')[0] for f in self.files if '/date=' in f})
+            scenarios += [
+                ('folder_time_range', self._get('/api/data/', {
+                    'path': partitioned[0],
+                    'filters': json.dumps({'date': {'gte': dates[len(dates) // 2]}, 'amount': {'gt': 1990}}),
+                })),
+                ('folder_full_scan', self._get('/api/data/', {
+                    'path': partitioned[0], 'filters': json.dumps({'country': 'FR'}),
+                })),
+            ]
+
+        restricted = self._restricted_scenario()
+        if restricted:
+            scenarios.append(restricted)
+        if txid:
+            scenarios.append(('repush_lookup', self._repush_lookup(txid)))
+        return scenarios
+
+    def _get(self, url, params):
+        def run():
+            return self.client.get(url, params).status_code
+        return run
+
+    def _grant_revoke(self, topic):
+        target, created = User.objects.get_or_create(username='bench_grant_target')
+        if created:
+            target.set_unusable_password()
+            target.save()
+
+        def run():
+            body = {'user_id': target.id, 'resource_path': topic, 'access': 'read'}
+            code = self.client.post('/api/permissions/grant/', body, format='json').status_code
+            if code >= 400:
+                return code
+            return self.client.post('/api/permissions/revoke/', body, format='json').status_code
+        return run
+
+    def _restricted_scenario(self):
+        """Lecture par un utilisateur non superuser, pour mesurer le coût des permissions"""
+        entry = PermissionEntry.objects.filter(
+            user__username__startswith='bench_user_', access='read'
+        ).select_related('user', 'resource').first()
+        if entry is None:
+            return None
+        client = APIClient()
+        client.force_authenticate(entry.user)
+        path = entry.resource.path
+        if entry.resource.is_folder:
+            params = {'browse': 'true', 'path': path}
+        else:
+            params = {'path': path}
+
+        def run():
+            return client.get('/api/data/', params).status_code
+        return ('data_restricted_user', run)
+
+    def _repush_lookup(self, txid):
+        """Recherche de la transaction seulement : la republication dans Kafka n'est pas mesurée"""
+        def run():
+            return 200 if find_transaction(self.root, txid) is not None else 404
+        return run
+
+    # ------------------------------------------
+    # Mesure
+    # ------------------------------------------
+
+    def _measure(self, run, iterations, warmup):
+        for _ in range(warmup):
+            try:
+                run()
+            except Exception:
+                pass
+        latencies = []
+        errors = 0
+        started = time.perf_counter()
+        for _ in range(iterations):
+            t0 = time.perf_counter()
+            # APIClient relance les exceptions du serveur : on les compte comme des erreurs
+            try:
+                code = run()
+            except Exception:
+                code = 500
+            latencies.append((time.perf_counter() - t0) * 1000)
+            if code >= 400:
+                errors += 1
+        elapsed = time.perf_counter() - started
+        latencies.sort()
+        return {
+            'iterations': iterations,
+            'errors': errors,
+            'p50_ms': round(percentile(latencies, 50), 3),
+            'p99_ms': round(percentile(latencies, 99), 3),
+            'mean_ms': round(sum(latencies) / len(latencies), 3),
+            'max_ms': round(latencies[-1], 3),
+            'throughput_rps': round(iterations / elapsed, 2) if elapsed else None,
+        }
+
+    def _discover_files(self, root):
+        files = []
+        for dirpath, dirs, filenames in os.walk(root):
+            dirs.sort()
+            for fname in sorted(filenames):
+                if fname.endswith(('.json', '.jsonl', '.csv')):
+                    files.append(os.path.relpath(os.path.join(dirpath, fname), root).replace('\\', '/'))
+        return files
+
+    def _sample_transaction_id(self):
+        """Choisir une transaction située vers la fin du parcours, pour un cas défavorable"""
+        jsonl = [f for f in self.files if f.endswith('.jsonl')]
+        if not jsonl:
+            return None
+        with open(os.path.join(self.root, jsonl[-1]), 'r', encoding='utf-8') as f:
+            lines = [line for line in f if line.strip()]
+        if not lines:
+            return None
+        return json.loads(self.rng.choice(lines)).get('transaction_id')
+
+    def _peak_rss_kb(self):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss est en octets sur macOS, en kilo-octets sur Linux
+        return peak // 1024 if sys.platform == 'darwin' else peak
+
+    def _git_commit(self):
+        try:
+            return subprocess.check_output(
+                ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR, stderr=subprocess.DEVNULL
+            ).decode().strip()
+        except Exception:
+            return None
@@ -0,0 +1,247 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.db import transaction
+from datalake_api.models import DataLakeResource, PermissionEntry, VersionEntry
+from datalake_api.partitions import ZoneMapBuilder, discard_zone_map, file_version, save_zone_map
+from datalake_api.readers import iter_records
+from datalake_api.sorting import parse_order_by, external_sort
+import os, json, time, tempfile, datetime
+
+DEDUP_KEY = 'transaction_id'
+HIDDEN_PREFIX = '.compacting-'
+
+
+class SourceChanged(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compact small JSONL files within each partition into larger files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--root', type=str, default=None,
+                            help='Data lake directory (defaults to settings.DATA_LAKE_ROOT)')
+        parser.add_argument('--topics', type=str, default=None,
+                            help='Comma separated topics to compact (defaults to every top-level directory)')
+        parser.add_argument('--small-size', type=int, default=settings.DATALAKE_COMPACT_SMALL_FILE_BYTES,
+                            help='Files below this size in bytes are compaction candidates')
+        parser.add_argument('--target-size', type=int, default=settings.DATALAKE_COMPACT_TARGET_BYTES,
+                            help='Maximum size in bytes of the inputs merged into one file')
+        parser.add_argument('--min-files', type=int, default=2,
+                            help='Minimum number of files for a group to be compacted')
+        parser.add_argument('--min-age', type=int, default=settings.DATALAKE_COMPACT_MIN_AGE,
+                            help='Skip files modified less than this many seconds ago (still being written)')
+        parser.add_argument('--sort-by', type=str, default=None,
+                            help='Sort key of the compacted files, e.g. timestamp or -amount,timestamp')
+        parser.add_argument('--dedup', action='store_true',
+                            help='Keep only the most recent record per %s' % DEDUP_KEY)
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Run again every N seconds instead of once')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        root = os.path.abspath(options['root'] or settings.DATA_LAKE_ROOT)
+        if not os.path.isdir(root):
+            raise CommandError('data lake root not found: %s' % root)
+        if options['sort_by'] and not parse_order_by(options['sort_by']):
+            raise CommandError('invalid --sort-by: %s' % options['sort_by'])
+
+        if not options['interval']:
+            self._run(root, options)
+            return
+        while True:
+            try:
+                self._run(root, options)
+            except Exception as e:
+                # Le mode planifié survit à une passe en échec
+                self.stderr.write(self.style.ERROR('compaction failed: %s' % e))
+            time.sleep(options['interval'])
+
+    def _run(self, root, options):
+        if options['topics']:
+            topics = [t.strip() for t in options['topics'].split(',') if t.strip()]
+        else:
+            topics = sorted(d for d in os.listdir(root) if os.path.isdir(os.path.join(root, d)) and not d.startswith('.'))
+
+        groups = files_in = files_out = dropped = 0
+        for topic in topics:
+            for dirpath, dirs, files in os.walk(os.path.join(root, topic)):
+                dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+                if not options['dry_run']:
+                    files = self._recover(dirpath, files)
+                for group in self._plan(root, dirpath, files, options):
+                    groups += 1
+                    files_in += len(group)
+                    if options['dry_run']:
+                        self.stdout.write('would compact %d files in %s' % (len(group), os.path.relpath(dirpath, root)))
+                        continue
+                    try:
+                        dropped += self._compact(root, dirpath, group, options)
+                    except SourceChanged:
+                        self.stdout.write(self.style.WARNING(
+                            'skipped %s: a source file changed during compaction' % os.path.relpath(dirpath, root)
+                        ))
+                        continue
+                    files_out += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            '%s %d groups: %d files into %d (%d duplicates dropped)'
+            % ('planned' if options['dry_run'] else 'compacted', groups, files_in, files_out, dropped)
+        ))
+
+    def _recover(self, dirpath, files):
+        """Terminer une compaction interrompue entre le masquage des sources et leur suppression
+
+        Publiée (le fichier compacté existe) : les sources masquées sont supprimées ;
+        sinon elles reprennent leur nom.
+        """
+        files = list(files)
+        for fname in [f for f in files if f.startswith(HIDDEN_PREFIX)]:
+            stamp, _, original = fname[len(HIDDEN_PREFIX):].partition('-')
+            hidden_path = os.path.join(dirpath, fname)
+            if os.path.exists(os.path.join(dirpath, 'part-compacted-%s.jsonl' % stamp)):
+                os.remove(hidden_path)
+            elif original:
+                os.rename(hidden_path, os.path.join(dirpath, original))
+                files.append(original)
+            files.remove(fname)
+        return files
+
+    def _plan(self, root, dirpath, files, options):
+        """Regrouper les petits fichiers d'une partition, par lots de --target-size au plus
+
+        Les fichiers avec des droits différents ne sont jamais fusionnés : un droit sur un
+        fichier ne doit pas donner accès aux lignes d'un autre.
+        """
+        now = time.time()
+        candidates = []
+        for fname in sorted(files):
+            if fname.startswith('.') or not fname.endswith('.jsonl'):
+                continue
+            full_path = os.path.join(dirpath, fname)
+            stat = os.stat(full_path)
+            if stat.st_size >= options['small_size'] or now - stat.st_mtime < options['min_age']:
+                continue
+            candidates.append((stat.st_mtime_ns, fname, full_path, stat.st_size))
+        if len(candidates) < options['min_files']:
+            return []
+        # Du plus ancien au plus récent : --dedup garde la dernière occurrence lue
+        candidates = [(full_path, size) for _, _, full_path, size in sorted(candidates)]
+
+        by_grants = {}
+        for full_path, size in candidates:
+            by_grants.setdefault(self._grants(self._relative(root, full_path)), []).append((full_path, size))
+
+        groups = []
+        for members in by_grants.values():
+            current, current_size = [], 0
+            for full_path, size in members:
+                if current and current_size + size > options['target_size']:
+                    groups.append(current)
+                    current, current_size = [], 0
+                current.append(full_path)
+                current_size += size
+            groups.append(current)
+        return [group for group in groups if len(group) >= options['min_files']]
+
+    def _grants(self, rel):
+        return frozenset(
+            PermissionEntry.objects.filter(resource__path=rel).values_list('user_id', 'access')
+        )
+
+    def _version(self, full_path):
+        stat = os.stat(full_path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _relative(self, root, full_path):
+        return os.path.relpath(full_path, root).replace('\\', '/')
+
+    def _records(self, group, options, stats):
+        if not options['dedup']:
+            for full_path in group:
+                for record in iter_records(full_path):
+                    stats['rows_in'] += 1
+                    yield record
+            return
+        # Première passe : dernière occurrence de chaque clé, les fichiers étant triés par mtime
+        last = {}
+        for index, full_path in enumerate(group):
+            for row, record in enumerate(iter_records(full_path)):
+                stats['rows_in'] += 1
+                if isinstance(record, dict) and record.get(DEDUP_KEY) is not None:
+                    last[str(record[DEDUP_KEY])] = (index, row)
+        for index, full_path in enumerate(group):
+            for row, record in enumerate(iter_records(full_path)):
+                if isinstance(record, dict) and record.get(DEDUP_KEY) is not None:
+                    if last.get(str(record[DEDUP_KEY]), (index, row)) != (index, row):
+                        continue
+                yield record
+
+    def _compact(self, root, dirpath, group, options):
+        """Écrire le fichier compacté, le publier atomiquement puis supprimer les sources"""
+        stamp = datetime.datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')
+        target = os.path.join(dirpath, 'part-compacted-%s.jsonl' % stamp)
+
+        versions = {p: self._version(p) for p in group}
+        stats = {'rows_in': 0}
+        records = self._records(group, options, stats)
+        order = parse_order_by(options['sort_by'])
+        if order:
+            os.makedirs(settings.DATALAKE_SORT_CACHE_DIR, exist_ok=True)
+            records = external_sort(records, order, settings.DATALAKE_SORT_RUN_SIZE, settings.DATALAKE_SORT_CACHE_DIR)
+
+        # Fichier caché : ignoré par les lectures de dossier tant qu'il n'est pas publié
+        fd, tmp = tempfile.mkstemp(prefix='.compact-', suffix='.tmp', dir=dirpath)
+        builder = ZoneMapBuilder()
+        hidden = []
+        published = False
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                for record in records:
+                    builder.add(record)
+                    f.write(json.dumps(record) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            with transaction.atomic():
+                self._move_mappings([self._relative(root, p) for p in group], self._relative(root, target))
+                # Sources masquées avant la publication : une lecture de dossier ne voit jamais
+                # les deux copies (une lecture déjà lancée ignore les fichiers disparus)
+                for full_path in group:
+                    hidden_path = os.path.join(dirpath, '%s%s-%s' % (HIDDEN_PREFIX, stamp, os.path.basename(full_path)))
+                    os.rename(full_path, hidden_path)
+                    hidden.append((full_path, hidden_path))
+                # Une source modifiée pendant la réécriture perdrait ses nouvelles lignes
+                if any(self._version(h) != versions[p] for p, h in hidden):
+                    raise SourceChanged()
+                os.replace(tmp, target)
+                published = True
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            elif published and os.path.exists(target):
+                os.remove(target)
+            for full_path, hidden_path in hidden:
+                os.rename(hidden_path, full_path)
+            raise
+
+        # Zone map du nouveau fichier (utile aux serveurs si CACHES est partagé entre processus)
+        save_zone_map(target, file_version(target), builder.as_dict())
+        for full_path, hidden_path in hidden:
+            os.remove(hidden_path)
+            discard_zone_map(full_path)
+
+        self.stdout.write('compacted %d files into %s (%d rows)'
+                          % (len(group), self._relative(root, target), builder.rows))
+        return stats['rows_in'] - builder.rows
+
+    def _move_mappings(self, sources, target):
+        """Reporter ressources, droits et versions des fichiers sources sur le fichier compacté"""
+        resources = list(DataLakeResource.objects.filter(path__in=sources))
+        if not resources:
+            return
+        new_resource, _ = DataLakeResource.objects.get_or_create(path=target, defaults={'is_folder': False})
+        for entry in PermissionEntry.objects.filter(resource__in=resources):
+            PermissionEntry.objects.get_or_create(user_id=entry.user_id, resource=new_resource, access=entry.access)
+        VersionEntry.objects.filter(resource__in=resources).update(resource=new_resource, file_path=target)
+        for resource in resources:
+            resource.delete()
@@ -0,0 +1,144 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from datalake_api.models import DataLakeResource, PermissionEntry
+import os, json, csv, random, datetime
+
+User = get_user_model()
+
+COUNTRIES = ['FR', 'DE', 'ES', 'IT', 'BE', 'US', 'GB', 'NL']
+CURRENCIES = ['EUR', 'USD', 'GBP']
+CATEGORIES = ['electronics', 'books', 'food', 'clothing', 'sports', 'home']
+PAYMENT_METHODS = ['card', 'paypal', 'transfer', 'cash']
+STATUSES = ['completed', 'pending', 'refunded', 'failed']
+
+
+class Command(BaseCommand):
+    help = 'Generate a synthetic data lake (files, users and permission grants) for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--root', type=str, required=True,
+                            help='Target directory; the configured DATA_LAKE_ROOT is refused without --force')
+        parser.add_argument('--force', action='store_true',
+                            help='Allow writing synthetic files into settings.DATA_LAKE_ROOT')
+        parser.add_argument('--topics', type=str, default='transactions,payments,refunds')
+        parser.add_argument('--files', type=int, default=5, help='Files per topic and format')
+        parser.add_argument('--records', type=int, default=1000, help='Average records per file')
+        parser.add_argument('--size-jitter', type=float, default=0.0,
+                            help='Relative random variation of the record count per file (0..1)')
+        parser.add_argument('--formats', type=str, default='jsonl,json,csv')
+        parser.add_argument('--extra-fields', type=int, default=0,
+                            help='Additional payload fields per record, to control record width')
+        parser.add_argument('--partitions', type=int, default=0,
+                            help='Hourly partitions per topic (topic/date=YYYY-MM-DD/hour=HH/), 0 for a flat layout')
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--grants-per-user', type=int, default=2)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--password', type=str, default=None,
+                            help='Password of the benchmark users (unusable by default: the benchmark does not log in)')
+
+    def handle(self, *args, **options):
+        root = options['root']
+        # Le data lake configuré est celui de la production Kafka : ne pas le polluer par défaut
+        if os.path.abspath(root) == os.path.abspath(settings.DATA_LAKE_ROOT) and not options['force']:
+            raise CommandError('%s is the configured DATA_LAKE_ROOT, pass --force to write into it' % root)
+        topics = [t.strip() for t in options['topics'].split(',') if t.strip()]
+        formats = [f.strip() for f in options['formats'].split(',') if f.strip()]
+        for fmt in formats:
+            if fmt not in ('json', 'jsonl', 'csv'):
+                raise CommandError('unsupported format: %s' % fmt)
+
+        rng = random.Random(options['seed'])
+        start = datetime.datetime(2025, 1, 1)
+        files = []
+        total_records = 0
+        if options['partitions']:
+            # Une partition par heure, horodatages des enregistrements dans cette heure
+            layouts = [
+                ('date=%s/hour=%02d/' % (h.strftime('%Y-%m-%d'), h.hour), h, 3600)
+                for h in (start + datetime.timedelta(hours=k) for k in range(options['partitions']))
+            ]
+        else:
+            layouts = [('', start, 90 * 86400)]
+
+        for topic in topics:
+            for prefix, window_start, window in layouts:
+                os.makedirs(os.path.join(root, topic, prefix), exist_ok=True)
+                for fmt in formats:
+                    for i in range(options['files']):
+                        jitter = options['size_jitter']
+                        count = options['records']
+                        if jitter:
+                            count = max(1, int(count * (1 + rng.uniform(-jitter, jitter))))
+                        tag = '%s%05d' % (prefix.replace('/', '').replace('=', ''), i)
+                        records = [
+                            self._make_record(rng, topic, fmt, tag, n, window_start, window, options['extra_fields'])
+                            for n in range(count)
+                        ]
+                        rel = '%s/%spart-%05d.%s' % (topic, prefix, i, fmt)
+                        self._write_file(os.path.join(root, rel), fmt, records)
+                        files.append(rel)
+                        total_records += count
+
+        users = self._create_users(rng, topics, files, options)
+
+        self.stdout.write(self.style.SUCCESS(
+            'generated %d files (%d records) and %d users under %s'
+            % (len(files), total_records, len(users), root)
+        ))
+
+    def _make_record(self, rng, topic, fmt, tag, n, start, window, extra_fields):
+        record = {
+            'transaction_id': '%s-%s-%s-%07d' % (topic, fmt, tag, n),
+            'user_id': rng.randint(1, 5000),
+            'amount': round(rng.uniform(1, 2000), 2),
+            'currency': rng.choice(CURRENCIES),
+            'country': rng.choice(COUNTRIES),
+            'category': rng.choice(CATEGORIES),
+            'product_id': 'P%05d' % rng.randint(1, 20000),
+            'payment_method': rng.choice(PAYMENT_METHODS),
+            'status': rng.choice(STATUSES),
+            'timestamp': (start + datetime.timedelta(seconds=rng.randint(0, window - 1))).isoformat(),
+        }
+        for k in range(extra_fields):
+            record['extra_%d' % k] = '%08x' % rng.getrandbits(32)
+        return record
+
+    def _write_file(self, path, fmt, records):
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            if fmt == 'json':
+                json.dump(records, f)
+            elif fmt == 'jsonl':
+                for rec in records:
+                    f.write(json.dumps(rec) + '\n')
+            else:
+                writer = csv.DictWriter(f, fieldnames=list(records[0].keys()))
+                writer.writeheader()
+                writer.writerows(records)
+
+    def _create_users(self, rng, topics, files, options):
+        admin, _ = User.objects.get_or_create(
+            username='bench_admin', defaults={'is_superuser': True, 'is_staff': True}
+        )
+        self._set_password(admin, options['password'])
+
+        candidates = topics + files
+        users = [admin]
+        for i in range(options['users']):
+            user, _ = User.objects.get_or_create(username='bench_user_%d' % i)
+            self._set_password(user, options['password'])
+            for path in rng.sample(candidates, min(options['grants_per_user'], len(candidates))):
+                resource, _ = DataLakeResource.objects.get_or_create(
+                    path=path, defaults={'is_folder': path in topics}
+                )
+                PermissionEntry.objects.get_or_create(user=user, resource=resource, access='read')
+            users.append(user)
+        return users
+
+    def _set_password(self, user, password):
+        # Sans --password, aucun compte de benchmark ne peut se connecter (superuser compris)
+        if password:
+            user.set_password(password)
+        else:
+            user.set_unusable_password()
+        user.save()
@@ -1,7 +1,24 @@
 from django.core.management.base import BaseCommand
 from django.conf import settings
+from datalake_api.readers import iter_records
 import os, json, subprocess, datetime
 
+
+def find_transaction(root, txid):
+    """Premier enregistrement JSON / JSONL du data lake portant ce transaction_id, ou None"""
+    for dirpath, dirs, files in os.walk(root):
+        for fname in files:
+            if fname.endswith(('.json','.jsonl')):
+                fp = os.path.join(dirpath, fname)
+                try:
+                    for rec in iter_records(fp):
+                        if isinstance(rec, dict) and str(rec.get('transaction_id'))==str(txid):
+                            return rec
+                except ValueError:
+                    pass
+    return None
+
+
 class Command(BaseCommand):
     help = 'Repush a transaction back to Kafka using local producer script'
 
@@ -9,36 +26,7 @@ class Command(BaseCommand):
         parser.add_argument('transaction_id', type=str)
 
     def handle(self, *args, **options):
-        txid = options['transaction_id']
-        root = settings.DATA_LAKE_ROOT
-        found = None
-        for dirpath, dirs, files in os.walk(root):
-            for fname in files:
-                if fname.endswith(('.json','.jsonl')):
-                    fp = os.path.join(dirpath, fname)
-                    with open(fp,'r',encoding='utf-8') as f:
-                        try:
-                            obj = json.load(f)
-                            arr = obj if isinstance(obj, list) else [obj]
-                        except Exception:
-                            f.seek(0)
-                            arr = []
-                            for line in f:
-                                line = line.strip()
-                                if not line:
-                                    continue
-                                try:
-                                    arr.append(json.loads(line))
-                                except Exception:
-                                    pass
-                        for rec in arr:
-                            if str(rec.get('transaction_id'))==str(txid):
-                                found = rec
-                                break
-                if found:
-                    break
-            if found:
-                break
+        found = find_transaction(settings.DATA_LAKE_ROOT, options['transaction_id'])
         if not found:
             self.stdout.write(self.style.ERROR('transaction not found'))
             return
@@ -32,7 +32,8 @@ class Migration(migrations.Migration):
                 ('status_code', models.IntegerField(null=True)),
                 ('request_body', models.TextField(blank=True, null=True)),
                 ('timestamp', models.DateTimeField(auto_now_add=True)),
-                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                # Sans contrainte SQL : la table peut être créée dans la base 'audit', sans auth_user
+                ('user', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
             ],
         ),
         migrations.CreateModel(
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:38
+
+import copy
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def drop_auditlog_user_constraint(apps, schema_editor):
+    # Bases créées par une version antérieure de 0001 : retirer la contrainte vers auth_user
+    AuditLog = apps.get_model('datalake_api', 'AuditLog')
+    table = AuditLog._meta.db_table
+    with schema_editor.connection.cursor() as cursor:
+        constraints = schema_editor.connection.introspection.get_constraints(cursor, table)
+    if not any(c['foreign_key'] and c['columns'] == ['user_id'] for c in constraints.values()):
+        return
+    new_field = AuditLog._meta.get_field('user')
+    old_field = copy.copy(new_field)
+    old_field.db_constraint = True
+    schema_editor.alter_field(AuditLog, old_field, new_field)
+
+
+def create_path_prefix_index(apps, schema_editor):
+    # Les recherches par préfixe (startswith) ne profitent de l'index unique sous
+    # PostgreSQL qu'avec varchar_pattern_ops ; les autres moteurs utilisent l'index existant.
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS resource_path_prefix_idx '
+            'ON datalake_api_datalakeresource (path varchar_pattern_ops)'
+        )
+
+
+def drop_path_prefix_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS resource_path_prefix_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datalake_api', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='auditlog',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(
+            drop_auditlog_user_constraint, migrations.RunPython.noop,
+            hints={'model_name': 'auditlog'},
+        ),
+        migrations.AddIndex(
+            model_name='permissionentry',
+            index=models.Index(fields=['user', 'access'], name='perm_user_access_idx'),
+        ),
+        migrations.RunPython(
+            create_path_prefix_index, drop_path_prefix_index,
+            hints={'model_name': 'datalakeresource'},
+        ),
+    ]
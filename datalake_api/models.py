@@ -1,5 +1,7 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+import uuid
 
 User = get_user_model()
 
@@ -23,9 +25,11 @@ class PermissionEntry(models.Model):
 
     class Meta:
         unique_together = ('user','resource','access')
+        indexes = [models.Index(fields=['user', 'access'], name='perm_user_access_idx')]
 
 class AuditLog(models.Model):
-    user = models.ForeignKey(User, null=True, on_delete=models.SET_NULL)
+    # Sans contrainte SQL : la table peut vivre dans une base séparée (voir routers.py)
+    user = models.ForeignKey(User, null=True, on_delete=models.DO_NOTHING, db_constraint=False)
     path = models.CharField(max_length=1024)
     method = models.CharField(max_length=10)
     status_code = models.IntegerField(null=True)
@@ -37,3 +41,29 @@ class VersionEntry(models.Model):
     version_tag = models.CharField(max_length=128)
     file_path = models.CharField(max_length=1024)
     created_at = models.DateTimeField(auto_now_add=True)
+
+class ExportJob(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = [(PENDING, 'Pending'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    spec = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUSES, default=PENDING)
+    output_dir = models.CharField(max_length=1024)
+    rows_scanned = models.BigIntegerField(default=0)
+    rows_selected = models.BigIntegerField(default=0)
+    rows_written = models.BigIntegerField(default=0)
+    files = models.JSONField(default=list)
+    error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True)
+    finished_at = models.DateTimeField(null=True)
+    # Rafraîchi par le processus qui détient le job (voir exports.fail_orphaned_jobs)
+    heartbeat_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [models.Index(fields=['user', 'status'], name='export_user_status_idx')]
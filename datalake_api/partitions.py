@@ -0,0 +1,247 @@
+from django.conf import settings
+from django.core.cache import caches
+import os
+import hashlib
+
+from .query import RANGE_OPS, matches, to_number
+from .readers import RecordReader, SUPPORTED_SUFFIXES
+
+
+# ==========================================
+# PARTITIONS HIVE (key=value)
+# ==========================================
+
+def parse_partition(relative_path):
+    """Extraire les colonnes virtuelles des segments `key=value` d'un chemin"""
+    partition = {}
+    for segment in relative_path.replace('\\', '/').split('/'):
+        key, sep, value = segment.partition('=')
+        if sep and key:
+            partition[key] = value
+    return partition
+
+
+def partition_may_match(partition, filters):
+    """Une partition est élaguée dès qu'un filtre sur une de ses clés échoue"""
+    if not filters:
+        return True
+    for key, value in partition.items():
+        if key in filters and not matches({key: value}, {key: filters[key]}):
+            return False
+    return True
+
+
+# ==========================================
+# ZONE MAPS (min/max par fichier)
+# ==========================================
+
+def _zone_map_key(full_path):
+    """Une entrée par fichier : la version est stockée avec la zone map et la remplace"""
+    return 'zonemap:%s' % hashlib.sha1(os.path.abspath(full_path).encode('utf-8')).hexdigest()
+
+
+def file_version(full_path):
+    stat = os.stat(full_path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def load_zone_map(full_path, version):
+    entry = caches['metadata'].get(_zone_map_key(full_path))
+    if entry is not None and entry['version'] == version:
+        return entry['zone_map']
+    return None
+
+
+def save_zone_map(full_path, version, zone_map):
+    caches['metadata'].set(_zone_map_key(full_path), {'version': version, 'zone_map': zone_map},
+                           settings.DATALAKE_ZONEMAP_TIMEOUT)
+
+
+def discard_zone_map(full_path):
+    caches['metadata'].delete(_zone_map_key(full_path))
+
+
+class ZoneMapBuilder:
+    """Statistiques min/max par colonne, accumulées pendant une lecture complète
+
+    Trois plages par colonne, calquées sur `query.compare` : `num` pour les valeurs
+    numériques, `text` pour les chaînes non numériques et `numtext` pour les chaînes
+    numériques comparées comme chaînes.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.columns = {}
+
+    def add(self, record):
+        self.rows += 1
+        if not isinstance(record, dict):
+            return
+        for field, value in record.items():
+            column = self.columns.get(field)
+            if column is None:
+                column = self.columns[field] = {'num': None, 'text': None, 'numtext': None}
+            number = to_number(value)
+            if number is not None:
+                # NaN ne satisfait aucune comparaison (query.compare) et fausserait les bornes
+                if number == number:
+                    self._widen(column, 'num', number)
+                if isinstance(value, str):
+                    self._widen(column, 'numtext', value)
+            elif isinstance(value, str):
+                self._widen(column, 'text', value)
+
+    def _widen(self, column, kind, value):
+        bounds = column[kind]
+        if bounds is None:
+            column[kind] = [value, value]
+        elif value < bounds[0]:
+            bounds[0] = value
+        elif value > bounds[1]:
+            bounds[1] = value
+
+    def as_dict(self):
+        return {'rows': self.rows, 'columns': self.columns}
+
+
+def _bounds_admit(bounds, op, target):
+    if bounds is None:
+        return False
+    low, high = bounds
+    if op == 'gt':
+        return high > target
+    if op == 'gte':
+        return high >= target
+    if op == 'lt':
+        return low < target
+    return low <= target
+
+
+def zone_map_may_match(zone_map, filters, skip=()):
+    """False si aucune ligne du fichier ne peut satisfaire les filtres"""
+    if not filters:
+        return True
+    columns = zone_map['columns']
+    for field, condition in filters.items():
+        if field in skip:
+            continue
+        column = columns.get(field)
+        if column is None:
+            # Colonne absente du fichier : aucun enregistrement ne peut correspondre
+            return False
+        if not isinstance(condition, dict):
+            continue
+        for op, target in condition.items():
+            if op not in RANGE_OPS:
+                continue
+            number = to_number(target)
+            if number is not None:
+                admitted = _bounds_admit(column['num'], op, number)
+                if isinstance(target, str):
+                    admitted = admitted or _bounds_admit(column['text'], op, target)
+            elif isinstance(target, str):
+                admitted = (_bounds_admit(column['text'], op, target)
+                            or _bounds_admit(column['numtext'], op, target))
+            else:
+                admitted = False
+            if not admitted:
+                return False
+    return True
+
+
+# ==========================================
+# LECTURE D'UN DOSSIER
+# ==========================================
+
+class FolderScan:
+    """Lecture en flux de tous les fichiers d'un dossier avec élagage
+
+    Les partitions dont les clés ne satisfont pas les filtres ne sont pas parcourues,
+    et les fichiers dont la zone map exclut les filtres ne sont pas ouverts. Les zone
+    maps manquantes sont calculées lors d'une lecture complète du fichier.
+    """
+    format = 'folder'
+
+    def __init__(self, folder, base_path, filters=None):
+        self.folder = str(folder)
+        self.base_path = str(base_path)
+        self.filters = filters or {}
+        self._rows_done = 0
+        self._bytes_done = 0
+        self._current = None
+        self.files_total = 0
+        self.files_read = 0
+        self.files_skipped = 0
+        self.files_vanished = 0
+        self.partitions_pruned = 0
+
+    def __iter__(self):
+        for dirpath, dirs, files in os.walk(self.folder):
+            dirs.sort()
+            partition = parse_partition(os.path.relpath(dirpath, self.base_path))
+            if not partition_may_match(partition, self.filters):
+                self.partitions_pruned += 1
+                dirs[:] = []
+                continue
+            for fname in sorted(files):
+                if fname.startswith('.') or not fname.endswith(SUPPORTED_SUFFIXES):
+                    continue
+                self.files_total += 1
+                yield from self._iter_file(os.path.join(dirpath, fname), partition)
+
+    def _iter_file(self, full_path, partition):
+        # Fichier listé puis supprimé (compaction) : ses lignes sont dans le fichier compacté
+        try:
+            # Version relevée avant lecture : un fichier qui grossit entre-temps en change
+            version = file_version(full_path)
+            reader = RecordReader(full_path)
+        except FileNotFoundError:
+            self.files_vanished += 1
+            return
+        zone_map = load_zone_map(full_path, version)
+        if zone_map is not None and not zone_map_may_match(zone_map, self.filters, skip=partition):
+            self.files_skipped += 1
+            return
+        self.files_read += 1
+        self._current = reader
+        builder = ZoneMapBuilder() if zone_map is None else None
+        started = False
+        try:
+            for record in reader:
+                started = True
+                if builder is not None:
+                    builder.add(record)
+                if partition and isinstance(record, dict):
+                    for column, value in partition.items():
+                        record.setdefault(column, value)
+                yield record
+            if builder is not None:
+                save_zone_map(full_path, version, builder.as_dict())
+        except FileNotFoundError:
+            # Supprimé entre la détection du format et l'ouverture ; une fois ouvert, la
+            # lecture continue sur le descripteur
+            if started:
+                raise
+            self.files_read -= 1
+            self.files_vanished += 1
+        finally:
+            self._rows_done += reader.rows_scanned
+            self._bytes_done += reader.bytes_read
+            self._current = None
+
+    @property
+    def rows_scanned(self):
+        return self._rows_done + (self._current.rows_scanned if self._current else 0)
+
+    @property
+    def bytes_read(self):
+        return self._bytes_done + (self._current.bytes_read if self._current else 0)
+
+    def pruning_stats(self):
+        return {
+            'files_total': self.files_total,
+            'files_read': self.files_read,
+            'files_skipped_zone_map': self.files_skipped,
+            'files_vanished': self.files_vanished,
+            'partitions_pruned': self.partitions_pruned,
+        }
@@ -1,5 +1,63 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.contrib.auth import get_user_model
 from rest_framework.permissions import BasePermission
+from .checks import shared_cache_configured
 from .models import DataLakeResource, PermissionEntry
+import hashlib
+
+User = get_user_model()
+
+
+def _version_key(user_id):
+    return 'perm_version:%s' % user_id
+
+
+def permission_version(user_id):
+    """Empreinte des droits d'un utilisateur, mise en cache et invalidée par signaux
+
+    Calculée sur les drapeaux is_superuser / is_active et sur chaque entrée
+    (ressource, chemin, accès) : renommer une ressource ou changer un accès la modifie.
+    La durée de vie finie borne l'effet d'une invalidation perdue (éviction, panne du cache).
+    """
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        flags = User.objects.filter(pk=user_id).values_list('is_superuser', 'is_active').first()
+        entries = PermissionEntry.objects.filter(user_id=user_id).order_by(
+            'resource_id', 'access'
+        ).values_list('resource_id', 'resource__path', 'access')
+        digest = hashlib.sha1(repr((flags, list(entries))).encode('utf-8')).hexdigest()
+        version = digest[:16]
+        cache.set(key, version, settings.DATALAKE_PERMISSION_VERSION_TIMEOUT)
+    return version
+
+
+def invalidate_permission_version(user_id):
+    cache.delete(_version_key(user_id))
+
+
+def readable_paths(user):
+    """Chemins lisibles par l'utilisateur
+
+    En mode DATALAKE_STATELESS_AUTH (cache partagé requis), ils sont mis en cache pour
+    la version courante de ses droits ; sinon ils sont relus en base à chaque appel.
+    """
+    if not settings.DATALAKE_STATELESS_AUTH or not shared_cache_configured():
+        return _load_readable_paths(user.pk)
+    key = 'perm_paths:%s:%s' % (user.pk, permission_version(user.pk))
+    paths = cache.get(key)
+    if paths is None:
+        paths = _load_readable_paths(user.pk)
+        cache.set(key, paths, settings.DATALAKE_PERMISSION_CACHE_TIMEOUT)
+    return paths
+
+
+def _load_readable_paths(user_id):
+    return frozenset(PermissionEntry.objects.filter(
+        user_id=user_id, access=PermissionEntry.READ
+    ).values_list('resource__path', flat=True))
+
 
 class HasDataLakeAccess(BasePermission):
     def has_permission(self, request, view):
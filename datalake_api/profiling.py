@@ -0,0 +1,109 @@
+from django.conf import settings
+from django.db import connection
+from contextlib import contextmanager
+import os
+import time
+import random
+import cProfile
+import datetime
+
+PROFILE_HEADER = 'HTTP_X_DATALAKE_PROFILE'
+
+
+class QueryProfile:
+    """Collecte le plan d'exécution et le coût de chaque étape d'une requête /api/data/"""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.plan = 'full_scan'
+        self.stages = {}
+        self.rows_scanned = 0
+        self.rows_returned = 0
+        self.bytes_read = 0
+        self.queries = {}
+        self.details = {}
+        self.profile_dump = None
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name, count_queries=False):
+        """Chronométrer une étape (et compter ses requêtes SQL si demandé)"""
+        if not self.enabled:
+            yield
+            return
+        counter = [0]
+
+        def wrapper(execute, sql, params, many, context):
+            counter[0] += 1
+            return execute(sql, params, many, context)
+
+        t0 = time.perf_counter()
+        try:
+            if count_queries:
+                with connection.execute_wrapper(wrapper):
+                    yield
+            else:
+                yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + (time.perf_counter() - t0) * 1000
+            if count_queries:
+                self.queries[name] = self.queries.get(name, 0) + counter[0]
+
+    def as_dict(self):
+        data = {
+            'plan': self.plan,
+            'rows_scanned': self.rows_scanned,
+            'rows_returned': self.rows_returned,
+            'bytes_read': self.bytes_read,
+            'timings_ms': {k: round(v, 3) for k, v in self.stages.items()},
+            'total_ms': round((time.perf_counter() - self._started) * 1000, 3),
+            'queries': self.queries,
+        }
+        data.update(self.details)
+        if self.profile_dump:
+            data['profile_dump'] = self.profile_dump
+        return data
+
+    def server_timing(self):
+        """Valeur de l'en-tête Server-Timing"""
+        return ', '.join('%s;dur=%.3f' % (k, v) for k, v in self.stages.items())
+
+
+def profile_requested(request):
+    """Le profil par en-tête n'est honoré que pour les utilisateurs qui l'ont activé"""
+    if request.META.get(PROFILE_HEADER, '').lower() not in ('1', 'true', 'yes'):
+        return False
+    user = request.user
+    if user.is_superuser:
+        return True
+    return user.get_username() in getattr(settings, 'DATALAKE_PROFILE_USERS', [])
+
+
+def should_sample_cprofile(request):
+    """Dump cProfile réservé aux superusers, échantillonné ou forcé par ?profile=true"""
+    if not request.user.is_superuser:
+        return False
+    if request.query_params.get('profile', 'false').lower() == 'true':
+        return True
+    return random.random() < getattr(settings, 'DATALAKE_PROFILE_SAMPLE_RATE', 0.0)
+
+
+@contextmanager
+def cprofile_dump(profile, request):
+    """Exécuter le bloc sous cProfile et stocker le dump dans DATALAKE_PROFILE_DIR"""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        directory = getattr(settings, 'DATALAKE_PROFILE_DIR', None)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            name = '%s-%s.prof' % (
+                datetime.datetime.utcnow().strftime('%Y%m%dT%H%M%S%f'),
+                request.user.get_username(),
+            )
+            dump_path = os.path.join(directory, name)
+            profiler.dump_stats(dump_path)
+            profile.profile_dump = dump_path
@@ -0,0 +1,186 @@
+import json
+import operator
+
+RANGE_OPS = ('gt', 'gte', 'lt', 'lte')
+_RANGE_FUNCS = {'gt': operator.gt, 'gte': operator.ge, 'lt': operator.lt, 'lte': operator.le}
+NUMERIC_COLUMN_TYPES = ('integer', 'float')
+
+
+def to_number(value):
+    """Valeur numérique ou None (les booléens ne sont pas des nombres)"""
+    if isinstance(value, bool) or value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def compare(value, target):
+    """-1, 0 ou 1 ; numérique si possible, sinon entre chaînes (dates ISO) ; None si incomparable"""
+    a, b = to_number(value), to_number(target)
+    if a is None or b is None:
+        if isinstance(value, str) and isinstance(target, str):
+            a, b = value, target
+        else:
+            return None
+    elif a != a or b != b:
+        # NaN : aucune relation d'ordre, comme float(value) > float(target)
+        return None
+    return (a > b) - (a < b)
+
+
+def _in_range(op, cmp):
+    if cmp is None:
+        return False
+    if op == 'gt':
+        return cmp > 0
+    if op == 'gte':
+        return cmp >= 0
+    if op == 'lt':
+        return cmp < 0
+    return cmp <= 0
+
+
+def matches(item, filters):
+    """Tester un enregistrement contre les filtres de /api/data/"""
+    if not isinstance(item, dict):
+        return False
+    for field, condition in filters.items():
+        if field not in item:
+            return False
+
+        value = item[field]
+
+        if not isinstance(condition, dict):
+            if str(value) != str(condition):
+                return False
+            continue
+
+        for op, target in condition.items():
+            if op == 'eq' and str(value) != str(target):
+                return False
+            elif op in RANGE_OPS:
+                if not _in_range(op, compare(value, target)):
+                    return False
+            elif op == 'in':
+                try:
+                    if value not in target:
+                        return False
+                except TypeError:
+                    return False
+            elif op == 'contains' and str(target) not in str(value):
+                return False
+
+    return True
+
+
+def _range_check(op, target, numeric_column):
+    """Comparateur d'intervalle dont la cible est convertie une seule fois
+
+    Même résultat que `_in_range(op, compare(value, target))` ; seul l'ordre des essais
+    change selon le type de colonne connu.
+    """
+    func = _RANGE_FUNCS[op]
+    number = to_number(target)
+    target_is_str = isinstance(target, str)
+
+    if number is not None:
+        def check(value):
+            if numeric_column or value.__class__ in (int, float):
+                try:
+                    if value.__class__ is not bool:
+                        return func(float(value), number)
+                except (TypeError, ValueError):
+                    pass
+            converted = to_number(value)
+            if converted is not None:
+                return func(converted, number)
+            return target_is_str and isinstance(value, str) and func(value, target)
+        return check
+
+    if target_is_str:
+        return lambda value: isinstance(value, str) and func(value, target)
+    return lambda value: False
+
+
+def _condition_checks(condition, numeric_column):
+    if not isinstance(condition, dict):
+        expected = str(condition)
+        return [lambda value: str(value) == expected]
+
+    checks = []
+    for op, target in condition.items():
+        if op == 'eq':
+            expected = str(target)
+            checks.append(lambda value, expected=expected: str(value) == expected)
+        elif op in RANGE_OPS:
+            checks.append(_range_check(op, target, numeric_column))
+        elif op == 'in':
+            def contained(value, target=target):
+                try:
+                    return value in target
+                except TypeError:
+                    return False
+            checks.append(contained)
+        elif op == 'contains':
+            needle = str(target)
+            checks.append(lambda value, needle=needle: needle in str(value))
+    return checks
+
+
+def compile_filters(filters, column_types=None):
+    """Construire un prédicat équivalent à `matches`, avec des cibles pré-converties
+
+    `column_types` (issu du schéma en cache) permet de tenter directement la
+    conversion numérique sur les colonnes connues comme numériques.
+    """
+    column_types = column_types or {}
+    compiled = [
+        (field, _condition_checks(condition, column_types.get(field) in NUMERIC_COLUMN_TYPES))
+        for field, condition in filters.items()
+    ]
+
+    def predicate(item):
+        if not isinstance(item, dict):
+            return False
+        for field, checks in compiled:
+            if field not in item:
+                return False
+            value = item[field]
+            for check in checks:
+                if not check(value):
+                    return False
+        return True
+    return predicate
+
+
+def filter_records(records, filters, column_types=None):
+    """Filtrer un flux d'enregistrements sans le matérialiser"""
+    if not filters:
+        return records
+    predicate = compile_filters(filters, column_types)
+    return (item for item in records if predicate(item))
+
+
+def project(records, fields):
+    """Ne garder que les champs demandés"""
+    return [{k: v for k, v in item.items() if k in fields} for item in records]
+
+
+def parse_filters(raw):
+    """Décoder le paramètre `filters` ; un JSON invalide est ignoré comme auparavant"""
+    if not raw:
+        return None
+    try:
+        filters = json.loads(raw)
+    except ValueError:
+        return None
+    return filters if isinstance(filters, dict) else None
+
+
+def parse_projection(raw):
+    if not raw:
+        return None
+    return [f.strip() for f in raw.split(',')]
+
@@ -0,0 +1,276 @@
+from django.conf import settings
+import re
+import csv
+import io
+import json
+import mmap
+import codecs
+
+SUPPORTED_SUFFIXES = ('.json', '.jsonl', '.csv')
+
+# Formats détectés à partir des premiers octets du fichier
+FORMAT_JSON_ARRAY = 'json_array'
+FORMAT_JSON = 'json'
+FORMAT_JSONL = 'jsonl'
+FORMAT_CSV = 'csv'
+
+_SEPARATORS = re.compile(r'[\s,]*')
+_NUMBER_CHARS = frozenset('0123456789+-.eE')
+
+
+def detect_format(full_path):
+    """Détecter JSON / JSONL à partir du premier octet significatif plutôt que par essai-erreur"""
+    if str(full_path).endswith('.csv'):
+        return FORMAT_CSV
+    with open(full_path, 'rb') as f:
+        head = f.read(64)
+        first = head.lstrip()[:1]
+        while not first and len(head) == 64:
+            head = f.read(64)
+            first = head.lstrip()[:1]
+        if first == b'[':
+            return FORMAT_JSON_ARRAY
+        if first != b'{':
+            return FORMAT_JSONL
+        # Un objet complet sur la première ligne => JSONL, sinon document JSON indenté
+        f.seek(0)
+        for line in f:
+            if line.strip():
+                try:
+                    json.loads(line)
+                    return FORMAT_JSONL
+                except ValueError:
+                    return FORMAT_JSON
+    return FORMAT_JSONL
+
+
+def iter_json_array(chunks):
+    """Itérer sur les éléments d'un tableau JSON de premier niveau sans charger le fichier
+
+    `chunks` est un itérable de morceaux de texte. Les éléments sont décodés un par un
+    avec `raw_decode`, le tampon ne conserve que la partie non encore consommée.
+    """
+    decoder = json.JSONDecoder()
+    chunks = iter(chunks)
+    buf = ''
+    pos = 0
+    eof = False
+
+    def more():
+        nonlocal buf, pos, eof
+        chunk = next(chunks, None)
+        if chunk is None:
+            eof = True
+            return
+        buf = buf[pos:] + chunk
+        pos = 0
+
+    # Sauter jusqu'au crochet ouvrant
+    while True:
+        stripped = buf.lstrip()
+        if stripped or eof:
+            break
+        buf = ''
+        more()
+    if not stripped.startswith('['):
+        raise ValueError('Le fichier ne commence pas par un tableau JSON')
+    buf = stripped
+    pos = 1
+
+    while True:
+        pos = _SEPARATORS.match(buf, pos).end()
+        if pos >= len(buf):
+            if eof:
+                raise ValueError('Tableau JSON non terminé')
+            more()
+            continue
+        if buf[pos] == ']':
+            return
+        try:
+            obj, end = decoder.raw_decode(buf, pos)
+        except ValueError:
+            if eof:
+                raise
+            more()
+            continue
+        # Un nombre coupé entre deux morceaux ("1e" + "5") se décode à tort : relire
+        if not eof and (end >= len(buf) or buf[end] in _NUMBER_CHARS):
+            more()
+            continue
+        pos = end
+        yield obj
+
+
+class RecordReader:
+    """Lecture en flux des enregistrements d'un fichier du data lake
+
+    Les compteurs `rows_scanned` et `bytes_read` reflètent ce qui a réellement été lu,
+    ce qui permet d'interrompre la lecture dès que la page demandée est complète.
+    """
+
+    def __init__(self, full_path, chunk_size=None, use_mmap=None):
+        self.full_path = full_path
+        self.chunk_size = chunk_size or getattr(settings, 'DATALAKE_READ_CHUNK_SIZE', 1024 * 1024)
+        self.use_mmap = getattr(settings, 'DATALAKE_USE_MMAP', False) if use_mmap is None else use_mmap
+        self.format = detect_format(full_path)
+        self.rows_scanned = 0
+        self.bytes_read = 0
+
+    def __iter__(self):
+        if self.format == FORMAT_CSV:
+            records = self._iter_csv()
+        elif self.format == FORMAT_JSON_ARRAY:
+            records = iter_json_array(self._iter_text_chunks())
+        elif self.format == FORMAT_JSON:
+            records = self._iter_document()
+        else:
+            records = self._iter_lines()
+        for record in records:
+            self.rows_scanned += 1
+            yield record
+
+    def _iter_text_chunks(self):
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        with open(self.full_path, 'rb') as f:
+            if self.use_mmap and self._size(f):
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    for start in range(0, len(mm), self.chunk_size):
+                        chunk = mm[start:start + self.chunk_size]
+                        self.bytes_read += len(chunk)
+                        yield decoder.decode(chunk)
+            else:
+                while True:
+                    chunk = f.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    self.bytes_read += len(chunk)
+                    yield decoder.decode(chunk)
+        tail = decoder.decode(b'', final=True)
+        if tail:
+            yield tail
+
+    def _iter_lines(self):
+        with open(self.full_path, 'rb') as f:
+            for line in f:
+                self.bytes_read += len(line)
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        pass
+
+    def _iter_document(self):
+        """Document JSON unique (objet indenté) ; repli ligne à ligne s'il est invalide"""
+        with open(self.full_path, 'rb') as f:
+            raw = f.read()
+        self.bytes_read += len(raw)
+        try:
+            obj = json.loads(raw)
+        except ValueError:
+            self.bytes_read = 0
+            yield from self._iter_lines()
+            return
+        yield from (obj if isinstance(obj, list) else [obj])
+
+    def _iter_csv(self):
+        with open(self.full_path, 'rb') as raw:
+            text = io.TextIOWrapper(raw, encoding='utf-8', newline='')
+            for row in csv.DictReader(text):
+                self.bytes_read = raw.tell()
+                yield row
+            self.bytes_read = raw.tell()
+
+    def iter_sample(self, rows, blocks):
+        """Environ `rows` enregistrements répartis sur tout le fichier
+
+        JSONL et CSV sont lus en `blocks` blocs placés à intervalles réguliers, chaque bloc
+        repartant de la ligne qui suit son offset ; les autres formats, qu'on ne peut pas
+        reprendre en milieu de fichier, sont lus depuis le début. `sampling` indique la
+        méthode et `skipped` si une partie du fichier n'a pas été lue.
+        """
+        self.skipped = False
+        if self.format in (FORMAT_JSONL, FORMAT_CSV):
+            self.sampling = 'blocks'
+            for record in self._iter_blocks(rows, blocks):
+                self.rows_scanned += 1
+                yield record
+            return
+        self.sampling = 'head'
+        for record in self:
+            if self.rows_scanned > rows:
+                self.skipped = True
+                return
+            yield record
+
+    def _iter_blocks(self, rows, blocks):
+        budget = rows
+        with open(self.full_path, 'rb') as f:
+            size = self._size(f)
+            header = None
+            if self.format == FORMAT_CSV:
+                first = f.readline()
+                self.bytes_read += len(first)
+                header = next(csv.reader([first.decode('utf-8')]), None)
+                if header is None:
+                    return
+            starts = sorted({size * i // blocks for i in range(blocks)})
+            for index, start in enumerate(starts):
+                stop = starts[index + 1] if index + 1 < len(starts) else size
+                # Le quota non consommé par les blocs courts est reporté sur les suivants
+                per_block = max(1, -(-budget // (len(starts) - index)))
+                if start > f.tell():
+                    f.seek(start - 1)
+                    # Octet précédent : l'offset tombe-t-il en début de ligne ?
+                    if f.read(1) != b'\n':
+                        self.bytes_read += len(f.readline())
+                    self.skipped = True
+                elif start < f.tell():
+                    # Le bloc précédent a déjà lu au-delà de cet offset
+                    if f.tell() >= stop:
+                        continue
+                lines = self._block_lines(f, stop)
+                if header is not None:
+                    records = csv.DictReader(lines, fieldnames=header)
+                else:
+                    records = self._decode_jsonl(lines)
+                count = 0
+                try:
+                    for record in records:
+                        yield record
+                        count += 1
+                        budget -= 1
+                        if count >= per_block:
+                            break
+                except csv.Error:
+                    # Champ entre guillemets coupé par la fin du bloc
+                    pass
+                if f.tell() < stop:
+                    self.skipped = True
+
+    def _block_lines(self, f, stop):
+        """Lignes décodées jusqu'à `stop` ; une ligne commencée avant `stop` est lue en entier"""
+        while f.tell() < stop:
+            line = f.readline()
+            if not line:
+                return
+            self.bytes_read += len(line)
+            yield line.decode('utf-8', errors='replace')
+
+    def _decode_jsonl(self, lines):
+        for line in lines:
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    pass
+
+    def _size(self, f):
+        f.seek(0, io.SEEK_END)
+        size = f.tell()
+        f.seek(0)
+        return size
+
+
+def iter_records(full_path):
+    """Raccourci : itérer sur les enregistrements d'un fichier"""
+    return iter(RecordReader(full_path))
@@ -0,0 +1,47 @@
+from django.conf import settings
+
+AUDIT_DB = 'audit'
+
+
+def _is_audit(model):
+    return model._meta.app_label == 'datalake_api' and model._meta.model_name == 'auditlog'
+
+
+class AuditLogRouter:
+    """Envoie AuditLog vers la base 'audit' si elle existe, pour ne pas bloquer la base principale"""
+
+    def _enabled(self):
+        return AUDIT_DB in settings.DATABASES
+
+    def _db_for(self, model, hints):
+        if not self._enabled():
+            return None
+        if _is_audit(model):
+            return AUDIT_DB
+        # Relation suivie depuis une ligne d'audit (log.user) : l'objet lié reste en base principale
+        instance = hints.get('instance')
+        if instance is not None and _is_audit(type(instance)):
+            return 'default'
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self._db_for(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._db_for(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # AuditLog.user pointe vers un utilisateur de la base principale (sans contrainte)
+        if _is_audit(type(obj1)) or _is_audit(type(obj2)):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if not self._enabled():
+            return None
+        is_audit = app_label == 'datalake_api' and model_name == 'auditlog'
+        if db == AUDIT_DB:
+            return is_audit
+        if is_audit:
+            return False
+        return None
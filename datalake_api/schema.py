@@ -0,0 +1,272 @@
+from django.conf import settings
+from django.core.cache import caches
+import os
+import math
+import random
+import hashlib
+import datetime
+
+from .readers import RecordReader
+
+NUMERIC_TYPES = ('integer', 'float')
+
+
+# ==========================================
+# HYPERLOGLOG
+# ==========================================
+
+class HyperLogLog:
+    """Estimation du nombre de valeurs distinctes en mémoire constante (2^p registres)
+
+    Les petites cardinalités sont comptées exactement jusqu'à `exact_limit` valeurs.
+    """
+
+    def __init__(self, p=12, exact_limit=1024):
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(self.m)
+        self.exact = set()
+        self.exact_limit = exact_limit
+        self._rest_bits = 64 - p
+        self._rest_mask = (1 << self._rest_bits) - 1
+
+    def add(self, value):
+        key = value if isinstance(value, str) else repr(value)
+        if self.exact is not None:
+            self.exact.add(key)
+            if len(self.exact) > self.exact_limit:
+                self.exact = None
+        x = hash(key) & 0xFFFFFFFFFFFFFFFF
+        index = x >> self._rest_bits
+        rank = self._rest_bits - (x & self._rest_mask).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self):
+        if self.exact is not None:
+            return len(self.exact)
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+# ==========================================
+# STATISTIQUES PAR COLONNE
+# ==========================================
+
+def value_type(value):
+    """Type logique d'une valeur ; les chaînes issues de CSV sont reconnues si numériques"""
+    if value is None or value == '':
+        return 'null'
+    if isinstance(value, bool):
+        return 'boolean'
+    if isinstance(value, int):
+        return 'integer'
+    if isinstance(value, float):
+        return 'float'
+    if isinstance(value, dict):
+        return 'object'
+    if isinstance(value, list):
+        return 'array'
+    if isinstance(value, str):
+        try:
+            int(value)
+            return 'integer'
+        except ValueError:
+            pass
+        try:
+            float(value)
+            return 'float'
+        except ValueError:
+            pass
+        if len(value) >= 10 and value[4:5] == '-' and value[7:8] == '-':
+            try:
+                datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+                return 'datetime'
+            except ValueError:
+                pass
+        return 'string'
+    return 'string'
+
+
+class ColumnStats:
+    def __init__(self, rng, reservoir_size):
+        self.types = {}
+        self.present = 0
+        self.distinct = HyperLogLog()
+        self.numeric_count = 0
+        self.numeric_sum = 0.0
+        self.numeric_min = None
+        self.numeric_max = None
+        self.non_finite = 0
+        self.reservoir = []
+        self.reservoir_size = reservoir_size
+        self.rng = rng
+
+    def add(self, value):
+        self.present += 1
+        kind = value_type(value)
+        self.types[kind] = self.types.get(kind, 0) + 1
+        if kind == 'null':
+            return
+        if kind in ('object', 'array'):
+            self.distinct.add(repr(value))
+            return
+        self.distinct.add(value)
+        if kind in NUMERIC_TYPES:
+            try:
+                number = float(value)
+            except OverflowError:
+                number = math.inf
+            if not math.isfinite(number):
+                # NaN et infinis comptés à part : ils fausseraient bornes, moyenne et histogramme
+                self.non_finite += 1
+                return
+            self.numeric_count += 1
+            self.numeric_sum += number
+            if self.numeric_min is None or number < self.numeric_min:
+                self.numeric_min = number
+            if self.numeric_max is None or number > self.numeric_max:
+                self.numeric_max = number
+            # Échantillon réservoir (algorithme R) pour l'histogramme
+            if len(self.reservoir) < self.reservoir_size:
+                self.reservoir.append(number)
+            else:
+                j = self.rng.randrange(self.numeric_count)
+                if j < self.reservoir_size:
+                    self.reservoir[j] = number
+
+    def inferred_type(self):
+        kinds = set(self.types) - {'null'}
+        if not kinds:
+            return 'null'
+        if kinds <= set(NUMERIC_TYPES):
+            return 'float' if 'float' in kinds else 'integer'
+        if len(kinds) == 1:
+            return kinds.pop()
+        return 'mixed'
+
+    def histogram(self, bins):
+        if not self.reservoir:
+            return None
+        low, high = self.numeric_min, self.numeric_max
+        if high == low:
+            return {'edges': [low, high], 'counts': [self.numeric_count]}
+        width = (high - low) / bins
+        counts = [0] * bins
+        for number in self.reservoir:
+            counts[min(bins - 1, int((number - low) / width))] += 1
+        # Mise à l'échelle du réservoir vers le nombre réel de valeurs
+        scale = self.numeric_count / len(self.reservoir)
+        return {
+            'edges': [low + i * width for i in range(bins)] + [high],
+            'counts': [int(round(c * scale)) for c in counts],
+        }
+
+    def as_dict(self, rows, bins):
+        nulls = self.types.get('null', 0) + (rows - self.present)
+        data = {
+            'type': self.inferred_type(),
+            'types': self.types,
+            'null_ratio': round(nulls / rows, 6) if rows else 0.0,
+            'distinct_estimate': self.distinct.count(),
+        }
+        if self.non_finite:
+            data['non_finite'] = self.non_finite
+        if self.numeric_count:
+            data['numeric'] = {
+                'min': self.numeric_min,
+                'max': self.numeric_max,
+                'mean': self.numeric_sum / self.numeric_count,
+                'histogram': self.histogram(bins),
+            }
+        return data
+
+
+# ==========================================
+# INFÉRENCE
+# ==========================================
+
+def _cache_key(full_path, sampled):
+    """Une entrée par fichier : la version (mtime, taille) est stockée avec le schéma
+
+    Chaque nouvelle version d'un fichier qui grossit remplace la précédente au lieu
+    d'ajouter une clé.
+    """
+    identity = '%s|%s' % (os.path.abspath(full_path), sampled)
+    return 'schema:%s' % hashlib.sha1(identity.encode('utf-8')).hexdigest()
+
+
+def _file_version(full_path):
+    stat = os.stat(full_path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _cached_schema(full_path, sampled, version):
+    entry = caches['metadata'].get(_cache_key(full_path, sampled))
+    if entry is not None and entry['version'] == version:
+        return entry['schema']
+    return None
+
+
+def infer_schema(full_path, sample_rows=None):
+    """Une seule passe sur le fichier, ou sur environ `sample_rows` lignes réparties dans le fichier"""
+    rng = random.Random(0)
+    reservoir_size = settings.DATALAKE_SCHEMA_RESERVOIR_SIZE
+    reader = RecordReader(full_path)
+    if sample_rows is None:
+        records = iter(reader)
+    else:
+        records = reader.iter_sample(sample_rows, settings.DATALAKE_SCHEMA_SAMPLE_BLOCKS)
+    columns = {}
+    rows = 0
+    for record in records:
+        rows += 1
+        if not isinstance(record, dict):
+            continue
+        for field, value in record.items():
+            stats = columns.get(field)
+            if stats is None:
+                stats = columns[field] = ColumnStats(rng, reservoir_size)
+            stats.add(value)
+
+    bins = settings.DATALAKE_SCHEMA_HISTOGRAM_BINS
+    return {
+        'format': reader.format,
+        'rows': rows,
+        # Vrai seulement si une partie du fichier n'a pas été lue ; `sampling` : blocks ou head
+        'sampled': sample_rows is not None and reader.skipped,
+        'sampling': reader.sampling if sample_rows is not None else None,
+        'bytes_read': reader.bytes_read,
+        'columns': {field: stats.as_dict(rows, bins) for field, stats in columns.items()},
+    }
+
+
+def get_schema(full_path, full=False):
+    """Schéma mis en cache par version du fichier ; échantillonné au-delà d'une taille seuil
+
+    Retourne (schema, cached).
+    """
+    version = _file_version(full_path)
+    sample = not full and version[1] > settings.DATALAKE_SCHEMA_SAMPLE_THRESHOLD
+    schema = _cached_schema(full_path, sample, version)
+    if schema is not None:
+        return schema, True
+    schema = infer_schema(full_path, settings.DATALAKE_SCHEMA_SAMPLE_ROWS if sample else None)
+    caches['metadata'].set(_cache_key(full_path, sample), {'version': version, 'schema': schema},
+                           settings.DATALAKE_SCHEMA_CACHE_TIMEOUT)
+    return schema, False
+
+
+def cached_column_types(full_path):
+    """Types de colonnes déjà connus pour ce fichier, sans jamais déclencher d'inférence"""
+    version = _file_version(full_path)
+    for sample in (False, True):
+        schema = _cached_schema(full_path, sample, version)
+        if schema is not None:
+            return {field: column['type'] for field, column in schema['columns'].items()}
+    return None
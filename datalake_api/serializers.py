@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import DataLakeResource, PermissionEntry, AuditLog, VersionEntry
+from .models import DataLakeResource, PermissionEntry, AuditLog, VersionEntry, ExportJob
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -25,3 +25,8 @@ class AuditLogSerializer(serializers.ModelSerializer):
     class Meta:
         model = AuditLog
         fields = '__all__'
+
+class ExportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ExportJob
+        exclude = ['user']
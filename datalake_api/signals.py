@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import DataLakeResource, PermissionEntry
+from .permissions import invalidate_permission_version
+from .authentication import user_cache
+
+User = get_user_model()
+
+
+@receiver([post_save, post_delete], sender=PermissionEntry)
+def permission_changed(sender, instance, **kwargs):
+    invalidate_permission_version(instance.user_id)
+
+
+@receiver(post_save, sender=DataLakeResource)
+def resource_changed(sender, instance, created, **kwargs):
+    if created:
+        return
+    for user_id in PermissionEntry.objects.filter(resource=instance).values_list('user_id', flat=True):
+        invalidate_permission_version(user_id)
+
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, **kwargs):
+    invalidate_permission_version(instance.pk)
+    user_cache.discard_user(instance.pk)
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    """Journal WAL et busy timeout : lectures et écritures d'audit ne se bloquent plus"""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in settings.DATALAKE_SQLITE_PRAGMAS.items():
+            cursor.execute('PRAGMA %s = %s' % (pragma, value))
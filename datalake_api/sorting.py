@@ -0,0 +1,209 @@
+from django.conf import settings
+import os
+import json
+import heapq
+import hashlib
+import tempfile
+
+from .readers import RecordReader
+
+# Rang de type : les nombres avant les chaînes, les valeurs absentes toujours en dernier
+_NUMBER, _STRING, _OTHER, _MISSING = range(4)
+
+
+def parse_order_by(raw):
+    """Décoder `-amount,timestamp` en [('amount', True), ('timestamp', False)]"""
+    if not raw:
+        return None
+    order = []
+    for part in raw.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        descending = part.startswith('-')
+        field = part.lstrip('+-').strip()
+        if field:
+            order.append((field, descending))
+    return order or None
+
+
+def _normalize(value):
+    if value is None or value == '':
+        return (_MISSING, 0)
+    if isinstance(value, bool):
+        return (_NUMBER, int(value))
+    if isinstance(value, str):
+        # Les CSV n'ont que des chaînes : comparer numériquement ce qui ressemble à un nombre
+        try:
+            value = float(value)
+        except ValueError:
+            return (_STRING, value)
+    if isinstance(value, (int, float)):
+        # NaN n'est pas ordonné et casserait le tri : traité comme une valeur absente
+        if value != value:
+            return (_MISSING, 0)
+        return (_NUMBER, value)
+    return (_OTHER, json.dumps(value, sort_keys=True, default=str))
+
+
+class SortKey:
+    """Clé de tri multi-champs avec un sens par champ"""
+    __slots__ = ('values', 'order')
+
+    def __init__(self, item, order):
+        self.order = order
+        if isinstance(item, dict):
+            self.values = [_normalize(item.get(field)) for field, _ in order]
+        else:
+            self.values = [(_MISSING, 0)] * len(order)
+
+    def __lt__(self, other):
+        for (field, descending), a, b in zip(self.order, self.values, other.values):
+            if a == b:
+                continue
+            # Les valeurs absentes restent en fin de liste quel que soit le sens
+            if a[0] == _MISSING or b[0] == _MISSING:
+                return b[0] == _MISSING
+            if a[0] != b[0]:
+                return (a[0] < b[0]) != descending
+            return (a[1] < b[1]) != descending
+        return False
+
+    def __eq__(self, other):
+        return self.values == other.values
+
+
+def sort_key(order):
+    return lambda item: SortKey(item, order)
+
+
+def top_k(records, order, k):
+    """Les k premiers enregistrements triés, en une passe et en mémoire bornée par k"""
+    return heapq.nsmallest(k, records, key=sort_key(order))
+
+
+# À changer quand l'ordre produit change, pour ne pas relire d'anciens fichiers triés
+_CACHE_FORMAT = 2
+
+
+def _digest(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def cache_path_for(full_path, order):
+    """Chemin du résultat trié : `<fichier + clé de tri>-<version (mtime, taille)>.jsonl`"""
+    stat = os.stat(full_path)
+    spec = ','.join(('-' if desc else '') + field for field, desc in order)
+    name = '%s-%s.jsonl' % (
+        _digest('%s|%s|%s' % (_CACHE_FORMAT, os.path.abspath(full_path), spec)),
+        _digest('%d|%d' % (stat.st_mtime_ns, stat.st_size))[:16],
+    )
+    return os.path.join(settings.DATALAKE_SORT_CACHE_DIR, name)
+
+
+def evict_sorted_cache(directory, keep):
+    """Supprimer les versions périmées de `keep`, puis les moins récemment lus au-delà du plafond
+
+    Un fichier qui grossit (Kafka) laisserait sinon une copie triée par version.
+    """
+    prefix = os.path.basename(keep).rsplit('-', 1)[0] + '-'
+    entries = []
+    for name in os.listdir(directory):
+        if not name.endswith('.jsonl'):
+            continue
+        path = os.path.join(directory, name)
+        if path != keep and name.startswith(prefix):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    limit = settings.DATALAKE_SORT_CACHE_MAX_BYTES
+    for _, size, path in sorted(entries):
+        if total <= limit:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+
+def _write_run(directory, records):
+    fd, path = tempfile.mkstemp(suffix='.run', dir=directory)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record) + '\n')
+    return path
+
+
+def _read_run(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def external_sort(records, order, run_size, directory):
+    """Tri externe : runs triés écrits sur disque puis fusion k-voies
+
+    Retourne un générateur ; les fichiers de runs sont supprimés en fin de fusion.
+    """
+    key = sort_key(order)
+    runs = []
+    try:
+        buffer = []
+        for record in records:
+            buffer.append(record)
+            if len(buffer) >= run_size:
+                buffer.sort(key=key)
+                runs.append(_write_run(directory, buffer))
+                buffer = []
+        if buffer:
+            buffer.sort(key=key)
+            runs.append(_write_run(directory, buffer))
+        yield from heapq.merge(*[_read_run(path) for path in runs], key=key)
+    finally:
+        for path in runs:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def sorted_file(full_path, order):
+    """Retourner le chemin du fichier trié en cache, en le construisant si besoin
+
+    Le second élément indique si le cache était déjà présent.
+    """
+    directory = settings.DATALAKE_SORT_CACHE_DIR
+    os.makedirs(directory, exist_ok=True)
+    target = cache_path_for(full_path, order)
+    if os.path.exists(target):
+        # mtime sert d'horodatage de dernière lecture pour l'éviction
+        os.utime(target)
+        return target, True
+
+    merged = external_sort(
+        RecordReader(full_path), order, settings.DATALAKE_SORT_RUN_SIZE, directory
+    )
+    fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            for record in merged:
+                f.write(json.dumps(record) + '\n')
+        os.replace(tmp, target)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    evict_sorted_cache(directory, target)
+    return target, False
@@ -0,0 +1,238 @@
+from django.conf import settings
+from rest_framework.renderers import BaseRenderer
+from bisect import bisect_left
+import os
+import json
+import time
+import threading
+
+
+# ==========================================
+# SURVEILLANCE PARTAGÉE D'UN FICHIER
+# ==========================================
+
+def _last_line_end(f, size, window=64 * 1024):
+    """Position juste après le dernier saut de ligne (0 si aucun)"""
+    pos = size
+    while pos > 0:
+        start = max(0, pos - window)
+        f.seek(start)
+        chunk = f.read(pos - start)
+        cut = chunk.rfind(b'\n')
+        if cut >= 0:
+            return start + cut + 1
+        pos = start
+    return 0
+
+
+def _next_line_end(f, pos, size, chunk_size):
+    """Position juste après le prochain saut de ligne à partir de `pos` (None si aucun)"""
+    f.seek(pos)
+    while pos < size:
+        chunk = f.read(min(size - pos, chunk_size))
+        if not chunk:
+            break
+        cut = chunk.find(b'\n')
+        if cut >= 0:
+            return pos + cut + 1
+        pos += len(chunk)
+    return None
+
+
+class FileWatcher:
+    """Un thread par fichier suivi, partagé par tous ses abonnés
+
+    Le thread surveille la taille du fichier et lit une seule fois chaque ajout. Seules
+    les lignes complètes sont publiées ; les dernières sont gardées en mémoire
+    (DATALAKE_TAIL_BUFFER_LINES) et un abonné en retard est rattrapé depuis le disque.
+    `end` est la position juste après la dernière ligne complète connue ; `generation`
+    augmente à chaque troncature, pour que les flux en cours sachent que leur offset
+    ne désigne plus rien.
+    """
+
+    def __init__(self, registry, full_path):
+        self.registry = registry
+        self.full_path = str(full_path)
+        self.condition = threading.Condition()
+        self.subscribers = 0
+        self.idle_since = time.monotonic()
+        self.stopped = False
+        self.generation = 0
+        self._starts = []
+        self._lines = []
+        with open(self.full_path, 'rb') as f:
+            self.end = _last_line_end(f, os.fstat(f.fileno()).st_size)
+        self._thread = threading.Thread(target=self._run, name='tail:%s' % self.full_path, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        interval = settings.DATALAKE_TAIL_POLL_INTERVAL
+        while True:
+            try:
+                self.poll()
+            except OSError:
+                pass
+            if self.registry._retire_if_idle(self):
+                with self.condition:
+                    self.condition.notify_all()
+                return
+            time.sleep(interval)
+
+    def poll(self):
+        size = os.path.getsize(self.full_path)
+        if size < self.end:
+            # Fichier tronqué ou remplacé : on repart de sa nouvelle fin
+            with open(self.full_path, 'rb') as f:
+                end = _last_line_end(f, size)
+            with self.condition:
+                self._starts, self._lines = [], []
+                self.end = end
+                self.generation += 1
+                self.condition.notify_all()
+            return
+        if size == self.end:
+            return
+
+        max_read = settings.DATALAKE_TAIL_MAX_READ
+        with open(self.full_path, 'rb') as f:
+            f.seek(self.end)
+            data = f.read(min(size - self.end, max_read))
+            cut = data.rfind(b'\n')
+            if cut < 0:
+                # Ligne plus longue que DATALAKE_TAIL_MAX_READ : chercher sa fin sans la garder en
+                # mémoire. Elle n'entre pas dans le tampon, les abonnés la relisent sur disque.
+                line_end = _next_line_end(f, self.end + len(data), size, max_read)
+                if line_end is None:
+                    return
+                with self.condition:
+                    self._starts, self._lines = [], []
+                    self.end = line_end
+                    self.condition.notify_all()
+                return
+        pos = self.end
+        starts, lines = [], []
+        for raw in data[:cut + 1].splitlines(keepends=True):
+            starts.append(pos)
+            pos += len(raw)
+            lines.append((pos, raw))
+
+        with self.condition:
+            self._starts.extend(starts)
+            self._lines.extend(lines)
+            excess = len(self._lines) - settings.DATALAKE_TAIL_BUFFER_LINES
+            if excess > 0:
+                del self._starts[:excess]
+                del self._lines[:excess]
+            self.end = pos
+            self.condition.notify_all()
+
+    def read(self, offset, limit):
+        """Lignes brutes complètes à partir de `offset` : (liste de (fin, ligne), fin connue)
+
+        Un offset qui tombe au milieu d'une ligne est aligné sur la ligne suivante.
+        """
+        with self.condition:
+            end = self.end
+            if offset >= end:
+                return [], end
+            if self._starts and offset >= self._starts[0]:
+                index = bisect_left(self._starts, offset)
+                return self._lines[index:index + limit], end
+        return self._read_disk(offset, end, limit), end
+
+    def _read_disk(self, offset, end, limit):
+        lines = []
+        with open(self.full_path, 'rb') as f:
+            if offset > 0:
+                f.seek(offset - 1)
+                if f.read(1) != b'\n':
+                    f.readline()
+            pos = f.tell()
+            while pos < end and len(lines) < limit:
+                raw = f.readline()
+                if not raw.endswith(b'\n'):
+                    break
+                pos += len(raw)
+                lines.append((pos, raw))
+        return lines
+
+    def wait(self, offset, timeout):
+        """Attendre des lignes au-delà de `offset` ou une troncature ; True si l'une survient"""
+        with self.condition:
+            generation = self.generation
+            return self.condition.wait_for(
+                lambda: self.end > offset or self.generation != generation or self.stopped, timeout
+            ) and not self.stopped
+
+
+class WatcherRegistry:
+    """Watchers par processus, indexés par chemin, arrêtés après une période sans abonné"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._watchers = {}
+
+    def subscribe(self, full_path):
+        key = str(full_path)
+        with self._lock:
+            watcher = self._watchers.get(key)
+            if watcher is None:
+                watcher = self._watchers[key] = FileWatcher(self, full_path)
+                watcher.start()
+            watcher.subscribers += 1
+            return watcher
+
+    def unsubscribe(self, watcher):
+        with self._lock:
+            watcher.subscribers -= 1
+            watcher.idle_since = time.monotonic()
+
+    def _retire_if_idle(self, watcher):
+        with self._lock:
+            if watcher.subscribers or time.monotonic() - watcher.idle_since < settings.DATALAKE_TAIL_IDLE_TIMEOUT:
+                return False
+            watcher.stopped = True
+            if self._watchers.get(watcher.full_path) is watcher:
+                del self._watchers[watcher.full_path]
+            return True
+
+
+watchers = WatcherRegistry()
+
+
+def decode_lines(lines):
+    """Enregistrements JSONL d'un lot de lignes ; les lignes invalides sont ignorées"""
+    records = []
+    for _, raw in lines:
+        if not raw.strip():
+            continue
+        try:
+            records.append(json.loads(raw))
+        except ValueError:
+            pass
+    return records
+
+
+# ==========================================
+# SERVER-SENT EVENTS
+# ==========================================
+
+def sse_event(data, event=None, event_id=None):
+    message = ''
+    if event_id is not None:
+        message += 'id: %s\n' % event_id
+    if event:
+        message += 'event: %s\n' % event
+    return message + 'data: %s\n\n' % json.dumps(data)
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Active ?format=sse / Accept: text/event-stream ; seules les erreurs passent par render"""
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return sse_event(data, event='error')
@@ -0,0 +1,589 @@
+import io
+import json
+import os
+import random
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.exceptions import AuthenticationFailed, Throttled
+from rest_framework.test import APIClient
+
+from .authentication import ClaimsJWTAuthentication, DataLakeTokenObtainPairSerializer, user_cache
+from .checks import check_stateless_auth_cache
+from .exports import stratified_sample
+from .models import DataLakeResource, PermissionEntry
+
+from .permissions import permission_version
+from .partitions import FolderScan, ZoneMapBuilder, zone_map_may_match
+from .query import compile_filters, matches
+from .readers import iter_json_array
+from .schema import get_schema, infer_schema
+from .sorting import external_sort, sort_key, top_k
+from .tailing import FileWatcher
+from .throttling import AdmissionController
+from .views import TailView
+
+
+def _chunked(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class IterJsonArrayTests(SimpleTestCase):
+    """Décodage en flux d'un tableau JSON découpé en morceaux arbitraires"""
+
+    items = [
+        {'id': 1, 'amount': 1e5, 'label': 'a, b] {c}'},
+        -12.5,
+        'texte "échappé" \\ ]',
+        [1, [2, 3], {}],
+        None,
+        True,
+        123456789,
+    ]
+
+    def test_every_chunk_size(self):
+        text = json.dumps(self.items)
+        for size in range(1, len(text) + 1):
+            with self.subTest(size=size):
+                self.assertEqual(list(iter_json_array(_chunked(text, size))), self.items)
+
+    def test_number_split_between_chunks(self):
+        self.assertEqual(list(iter_json_array(['[1e', '5, 12', '34]'])), [1e5, 1234])
+        self.assertEqual(list(iter_json_array(['[-', '0.', '25', ']'])), [-0.25])
+
+    def test_whitespace_and_empty_array(self):
+        self.assertEqual(list(iter_json_array(['  \n', ' [ ', ' ]'])), [])
+        self.assertEqual(list(iter_json_array(['\n[ {"a": 1} ,\n', ' {"a": 2}\n]\n'])), [{'a': 1}, {'a': 2}])
+
+    def test_not_an_array(self):
+        with self.assertRaises(ValueError):
+            list(iter_json_array(['{"a": 1}']))
+
+    def test_unterminated_array(self):
+        with self.assertRaises(ValueError):
+            list(iter_json_array(['[1, 2', ', 3']))
+
+
+class CompileFiltersTests(SimpleTestCase):
+    """`compile_filters` doit accepter exactement les mêmes enregistrements que `matches`"""
+
+    values = [
+        0, 1, -3, 2.5, 10, 100, '5', '10', '2.5', 'abc', '2024-01-01', '2024-06-30T12:00:00',
+        '', True, False, None, [1, 2], {'k': 1}, 'nan',
+    ]
+
+    def _records(self, rng, count):
+        records = []
+        for _ in range(count):
+            record = {field: rng.choice(self.values) for field in ('a', 'b') if rng.random() < 0.9}
+            records.append(record)
+        records.extend([None, 'ligne', 42, []])
+        return records
+
+    def _filters(self, rng):
+        ops = ['eq', 'gt', 'gte', 'lt', 'lte', 'in', 'contains']
+        filters = {}
+        for field in rng.sample(['a', 'b', 'c'], rng.randint(1, 2)):
+            if rng.random() < 0.2:
+                filters[field] = rng.choice(self.values)
+                continue
+            condition = {}
+            for op in rng.sample(ops, rng.randint(1, 2)):
+                if op == 'in':
+                    condition[op] = rng.choice([[1, '5', 'abc'], 'abcdef', 3])
+                else:
+                    condition[op] = rng.choice(self.values)
+            filters[field] = condition
+        return filters
+
+    def test_equivalent_to_matches(self):
+        rng = random.Random(0)
+        records = self._records(rng, 200)
+        for _ in range(300):
+            filters = self._filters(rng)
+            for column_types in (None, {'a': 'integer', 'b': 'string'}, {'a': 'string', 'b': 'float'}):
+                predicate = compile_filters(filters, column_types)
+                for record in records:
+                    with self.subTest(filters=filters, column_types=column_types, record=record):
+                        self.assertEqual(predicate(record), matches(record, filters))
+
+
+class ZoneMapTests(SimpleTestCase):
+    """Un fichier écarté par sa zone map ne doit contenir aucun enregistrement correspondant"""
+
+    def _zone_map(self, records):
+        builder = ZoneMapBuilder()
+        for record in records:
+            builder.add(record)
+        return builder.as_dict()
+
+    def test_prunes_out_of_range(self):
+        zone_map = self._zone_map([{'amount': 10, 'day': '2024-01-02'}, {'amount': 50, 'day': '2024-01-05'}])
+        self.assertFalse(zone_map_may_match(zone_map, {'amount': {'gt': 50}}))
+        self.assertTrue(zone_map_may_match(zone_map, {'amount': {'gte': 50}}))
+        self.assertFalse(zone_map_may_match(zone_map, {'day': {'lt': '2024-01-01'}}))
+        self.assertTrue(zone_map_may_match(zone_map, {'day': {'lte': '2024-01-02'}}))
+        self.assertFalse(zone_map_may_match(zone_map, {'missing': 1}))
+        self.assertTrue(zone_map_may_match(zone_map, {'missing': {'gt': 1}}, skip=('missing',)))
+        self.assertTrue(zone_map_may_match(zone_map, {'amount': {'contains': '9'}}))
+
+    def test_numeric_strings(self):
+        zone_map = self._zone_map([{'v': '9'}, {'v': '10'}])
+        self.assertTrue(zone_map_may_match(zone_map, {'v': {'gt': 9}}))
+        self.assertFalse(zone_map_may_match(zone_map, {'v': {'gt': 10}}))
+        self.assertFalse(zone_map_may_match(zone_map, {'v': {'gt': '10'}}))
+        # Cible non numérique : comparaison entre chaînes, '9' > '10a'
+        self.assertTrue(zone_map_may_match(zone_map, {'v': {'gt': '10a'}}))
+        self.assertFalse(zone_map_may_match(zone_map, {'v': {'gt': '9a'}}))
+
+    def test_nan_does_not_hide_other_values(self):
+        zone_map = self._zone_map([{'v': 'nan'}, {'v': 5}, {'v': 200}])
+        self.assertTrue(zone_map_may_match(zone_map, {'v': {'gt': 100}}))
+        self.assertTrue(zone_map_may_match(zone_map, {'v': {'lt': 10}}))
+        self.assertFalse(zone_map_may_match(zone_map, {'v': {'gt': 200}}))
+
+    def test_never_prunes_a_matching_file(self):
+        rng = random.Random(1)
+        values = CompileFiltersTests.values + [-1e9, 1e9, '999', '0010']
+        for _ in range(500):
+            records = [{'x': rng.choice(values)} for _ in range(rng.randint(1, 6))]
+            zone_map = self._zone_map(records)
+            op = rng.choice(['gt', 'gte', 'lt', 'lte'])
+            filters = {'x': {op: rng.choice(values)}}
+            if any(matches(record, filters) for record in records):
+                with self.subTest(records=records, filters=filters):
+                    self.assertTrue(zone_map_may_match(zone_map, filters))
+
+
+class SortingTests(SimpleTestCase):
+    """Ordre total sur des valeurs hétérogènes, identique en mémoire, en top-k et en tri externe"""
+
+    values = [
+        5, 1, -2, 2.5, 1e9, float('nan'), float('inf'), '3', '10', 'nan', 'NaN', 'inf', 'abc', 'Abc',
+        '2024-01-01', '', None, True, False, [1], {'k': 1},
+    ]
+    orders = [[('v', False)], [('v', True)], [('v', True), ('w', False)]]
+
+    def _records(self, rng, count):
+        records = []
+        for i in range(count):
+            record = {'id': i, 'v': rng.choice(self.values), 'w': rng.choice(self.values)}
+            if rng.random() < 0.1:
+                del record['v']
+            records.append(record)
+        return records
+
+    def _assert_sorted(self, records, order):
+        key = sort_key(order)
+        for previous, current in zip(records, records[1:]):
+            self.assertFalse(key(current) < key(previous), (previous, current))
+
+    def test_nan_keeps_order_consistent(self):
+        order = [('v', False)]
+        records = [{'v': v} for v in [5, 'nan', 1, 4, 'nan', 2, 3]]
+        self.assertEqual([r['v'] for r in sorted(records, key=sort_key(order))], [1, 2, 3, 4, 5, 'nan', 'nan'])
+        self.assertEqual([r['v'] for r in top_k(records, order, 3)], [1, 2, 3])
+        self.assertEqual([r['v'] for r in top_k(records, [('v', True)], 3)], [5, 4, 3])
+
+    def test_missing_values_last_in_both_directions(self):
+        records = [{'v': 2}, {}, {'v': None}, {'v': 1}, 'pas un objet']
+        for descending in (False, True):
+            result = sorted(records, key=sort_key([('v', descending)]))
+            self.assertEqual([r['v'] for r in result[:2]], [1, 2][::-1 if descending else 1])
+
+    def test_sort_top_k_and_external_sort_agree(self):
+        rng = random.Random(2)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(os.rmdir, directory)
+        for order in self.orders:
+            records = self._records(rng, 300)
+            key = sort_key(order)
+            expected = sorted(records, key=key)
+            with self.subTest(order=order):
+                self._assert_sorted(expected, order)
+                self.assertEqual([key(r).values for r in top_k(records, order, 25)],
+                                 [key(r).values for r in expected[:25]])
+                merged = list(external_sort(iter(records), order, 7, directory))
+                self.assertEqual(len(merged), len(records))
+                self._assert_sorted(merged, order)
+                self.assertEqual([key(r).values for r in merged], [key(r).values for r in expected])
+                self.assertEqual(os.listdir(directory), [])
+
+class StratifiedSampleTests(SimpleTestCase):
+    """Au plus `size` lignes par strate, et un total borné quel que soit le nombre de strates"""
+
+    def test_keeps_size_rows_per_stratum_in_order(self):
+        records = [{'label': index % 3, 'i': index} for index in range(30)]
+        sample = stratified_sample(records, 'label', 4, random.Random(0))
+        self.assertEqual([row['i'] for row in sample], sorted(row['i'] for row in sample))
+        self.assertEqual([sum(1 for row in sample if row['label'] == label) for label in range(3)], [4, 4, 4])
+
+    @override_settings(DATALAKE_EXPORT_MAX_SAMPLE_ROWS=10)
+    def test_total_rows_are_capped(self):
+        self.assertEqual(len(stratified_sample(({'label': i % 5} for i in range(100)), 'label', 2, random.Random(0))), 10)
+        records = ({'label': i} for i in range(100))
+        with self.assertRaises(ValueError):
+            stratified_sample(records, 'label', 2, random.Random(0))
+        # Arrêt dès le dépassement, sans lire le reste du flux
+        self.assertEqual(next(records), {'label': 11})
+
+
+class SchemaSamplingTests(SimpleTestCase):
+    """L'échantillon couvre tout le fichier et n'est signalé que si des lignes ont été sautées"""
+
+    def _write(self, suffix, text):
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def _jsonl(self, count):
+        return self._write('.jsonl', ''.join(json.dumps({'n': i, 'tag': 'x' * (i % 7)}) + '\n' for i in range(count)))
+
+    def test_jsonl_blocks_reach_end_of_file(self):
+        schema = infer_schema(self._jsonl(10000), sample_rows=500)
+        self.assertTrue(schema['sampled'])
+        self.assertEqual(schema['sampling'], 'blocks')
+        self.assertLessEqual(schema['rows'], 500)
+        numeric = schema['columns']['n']['numeric']
+        self.assertLess(numeric['min'], 100)
+        self.assertGreater(numeric['max'], 9000)
+
+    def test_csv_blocks(self):
+        path = self._write('.csv', 'n,label\n' + ''.join('%d,"a,%d"\n' % (i, i) for i in range(5000)))
+        schema = infer_schema(path, sample_rows=200)
+        self.assertTrue(schema['sampled'])
+        self.assertEqual(schema['columns']['n']['type'], 'integer')
+        self.assertEqual(schema['columns']['label']['type'], 'string')
+        self.assertGreater(schema['columns']['n']['numeric']['max'], 4500)
+
+    def test_small_file_is_read_entirely(self):
+        for count in (0, 1, 50, 400):
+            with self.subTest(count=count):
+                schema = infer_schema(self._jsonl(count), sample_rows=500)
+                self.assertFalse(schema['sampled'])
+                self.assertEqual(schema['rows'], count)
+
+    def test_sampled_only_when_rows_are_missed(self):
+        for count in (450, 500, 501, 600):
+            with self.subTest(count=count):
+                schema = infer_schema(self._jsonl(count), sample_rows=500)
+                self.assertEqual(schema['sampled'], schema['rows'] < count)
+
+    def test_json_array_falls_back_to_head(self):
+        path = self._write('.json', json.dumps([{'n': i} for i in range(100)]))
+        schema = infer_schema(path, sample_rows=100)
+        self.assertEqual((schema['sampling'], schema['sampled'], schema['rows']), ('head', False, 100))
+        schema = infer_schema(path, sample_rows=99)
+        self.assertEqual((schema['sampling'], schema['sampled'], schema['rows']), ('head', True, 99))
+
+    def test_non_finite_values_kept_out_of_numeric_stats(self):
+        path = self._write('.jsonl', '{"v": 1}\n{"v": NaN}\n{"v": 3.5}\n{"v": Infinity}\n{"v": 1e999}\n')
+        column = infer_schema(path)['columns']['v']
+        self.assertEqual(column['non_finite'], 3)
+        self.assertEqual((column['numeric']['min'], column['numeric']['max']), (1.0, 3.5))
+        self.assertEqual(sum(column['numeric']['histogram']['counts']), 2)
+        path = self._write('.csv', 'v\ninf\n-inf\nnan\n')
+        column = infer_schema(path)['columns']['v']
+        self.assertEqual((column['type'], column['non_finite']), ('float', 3))
+        self.assertNotIn('numeric', column)
+
+    def test_cache_keeps_one_entry_per_file(self):
+        path = self._jsonl(10)
+        self.addCleanup(caches['metadata'].clear)
+        self.assertFalse(get_schema(path)[1])
+        self.assertTrue(get_schema(path)[1])
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write('{"n": 10, "tag": ""}\n')
+        schema, cached = get_schema(path)
+        self.assertEqual((schema['rows'], cached), (11, False))
+        keys = [key for key in caches['metadata']._cache if ':schema:' in key]
+        self.assertEqual(len(keys), 1)
+
+
+class CompactionConsistencyTests(TestCase):
+    """Une lecture de dossier pendant une compaction ne voit jamais deux copies ni d'erreur"""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.addCleanup(caches['metadata'].clear)
+        self.folder = os.path.join(self.root, 'transactions', 'date=2024-01-01')
+        os.makedirs(self.folder)
+        for part in range(3):
+            with open(os.path.join(self.folder, 'part-%d.jsonl' % part), 'w', encoding='utf-8') as f:
+                for row in range(5):
+                    f.write(json.dumps({'transaction_id': '%d-%d' % (part, row), 'part': part}) + '\n')
+
+    def _visible(self):
+        return sorted(f for f in os.listdir(self.folder) if not f.startswith('.'))
+
+    def _zone_map_keys(self):
+        return [key for key in caches['metadata']._cache if ':zonemap:' in key]
+
+    def _compact(self):
+        call_command('compact_datalake', root=self.root, min_age=0, stdout=io.StringIO())
+
+    def test_scan_skips_files_removed_after_listing(self):
+        scan = FolderScan(os.path.join(self.root, 'transactions'), self.root)
+        records = iter(scan)
+        first = next(records)
+        os.remove(os.path.join(self.folder, 'part-1.jsonl'))
+        rows = [first] + list(records)
+        self.assertEqual(len(rows), 10)
+        self.assertEqual({row['part'] for row in rows}, {0, 2})
+        self.assertEqual(scan.pruning_stats()['files_vanished'], 1)
+
+    def test_sources_hidden_before_target_is_published(self):
+        seen = []
+        replace = os.replace
+
+        def publish(src, dst):
+            seen.append(self._visible())
+            replace(src, dst)
+
+        with mock.patch('datalake_api.management.commands.compact_datalake.os.replace', publish):
+            self._compact()
+        self.assertEqual(seen, [[]])
+        files = os.listdir(self.folder)
+        self.assertEqual(len(files), 1)
+        self.assertTrue(files[0].startswith('part-compacted-'))
+        self.assertEqual(len(list(FolderScan(self.folder, self.root))), 15)
+
+    def test_zone_maps_of_sources_are_discarded(self):
+        list(FolderScan(self.folder, self.root))
+        self.assertEqual(len(self._zone_map_keys()), 3)
+        self._compact()
+        self.assertEqual(len(self._zone_map_keys()), 1)
+        scan = FolderScan(self.folder, self.root, {'part': {'gt': 5}})
+        self.assertEqual(list(scan), [])
+        self.assertEqual(scan.pruning_stats()['files_skipped_zone_map'], 1)
+
+    def test_growing_file_keeps_one_zone_map(self):
+        path = os.path.join(self.folder, 'part-0.jsonl')
+        list(FolderScan(self.folder, self.root))
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'transaction_id': '0-5', 'part': 9}) + '\n')
+        scan = FolderScan(self.folder, self.root, {'part': {'gte': 9}})
+        self.assertEqual({row['part'] for row in scan}, {0, 9})
+        self.assertEqual(scan.pruning_stats()['files_skipped_zone_map'], 2)
+        self.assertEqual(len(self._zone_map_keys()), 3)
+
+    def test_source_changed_restores_sources(self):
+        version = mock.patch(
+            'datalake_api.management.commands.compact_datalake.Command._version',
+            side_effect=lambda path: (os.path.basename(path), 0),
+        )
+        with version:
+            self._compact()
+        self.assertEqual(self._visible(), ['part-0.jsonl', 'part-1.jsonl', 'part-2.jsonl'])
+        self.assertEqual(len(os.listdir(self.folder)), 3)
+
+    def test_interrupted_compaction_is_recovered(self):
+        os.rename(os.path.join(self.folder, 'part-0.jsonl'),
+                  os.path.join(self.folder, '.compacting-20240101T000000000000-part-0.jsonl'))
+        os.rename(os.path.join(self.folder, 'part-1.jsonl'),
+                  os.path.join(self.folder, '.compacting-20240101T000001000000-part-1.jsonl'))
+        open(os.path.join(self.folder, 'part-compacted-20240101T000001000000.jsonl'), 'w').close()
+        call_command('compact_datalake', root=self.root, min_age=0, min_files=10, stdout=io.StringIO())
+        self.assertEqual(sorted(os.listdir(self.folder)),
+                         ['part-0.jsonl', 'part-2.jsonl', 'part-compacted-20240101T000001000000.jsonl'])
+
+
+class StatelessAuthTests(TestCase):
+    """Le mode sans état retombe sur la base dès que les droits ou le compte changent"""
+
+    def setUp(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        shared = override_settings(DATALAKE_STATELESS_AUTH=True, CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': location,
+        }})
+        shared.enable()
+        self.addCleanup(shared.disable)
+        self.user = get_user_model().objects.create_user('analyst', is_superuser=True)
+        self.addCleanup(user_cache.discard_user, self.user.pk)
+        self.auth = ClaimsJWTAuthentication()
+
+    def _authenticate(self, token):
+        return self.auth.get_user(self.auth.get_validated_token(str(token)))
+
+    def _token(self):
+        return DataLakeTokenObtainPairSerializer.get_token(self.user).access_token
+
+    def test_version_changes_on_grant_revoke_and_rename(self):
+        resource = DataLakeResource.objects.create(path='sales')
+        versions = [permission_version(self.user.pk)]
+        entry = PermissionEntry.objects.create(user=self.user, resource=resource, access=PermissionEntry.READ)
+        versions.append(permission_version(self.user.pk))
+        resource.path = 'sales_eu'
+        resource.save()
+        versions.append(permission_version(self.user.pk))
+        entry.delete()
+        versions.append(permission_version(self.user.pk))
+        self.assertEqual(len(set(versions[:3])), 3)
+        self.assertNotEqual(versions[3], versions[2])
+
+    def test_current_token_needs_no_query(self):
+        token = self._token()
+        with self.assertNumQueries(0):
+            user = self._authenticate(token)
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertTrue(user.is_superuser)
+
+    def test_demoted_superuser_token_is_reloaded(self):
+        token = self._token()
+        self.assertTrue(self._authenticate(token).is_superuser)
+        self.user.is_superuser = False
+        self.user.save()
+        self.assertFalse(self._authenticate(token).is_superuser)
+
+    def test_deactivated_user_is_rejected(self):
+        token = self._token()
+        self._authenticate(token)
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self._authenticate(token)
+
+    def test_local_cache_is_refused(self):
+        self.assertEqual(check_stateless_auth_cache(None), [])
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            errors = check_stateless_auth_cache(None)
+            token = self._token()
+            with self.assertNumQueries(1):
+                self._authenticate(token)
+        self.assertEqual([error.id for error in errors], ['datalake_api.E001'])
+
+
+@override_settings(DATALAKE_ADMISSION_ENABLED=True, DATALAKE_ADMISSION_BUCKET_CAPACITY=10,
+                   DATALAKE_ADMISSION_REFILL_RATE=1, DATALAKE_ADMISSION_HEAVY_COST=5,
+                   DATALAKE_ADMISSION_MAX_HEAVY_PER_USER=1, DATALAKE_ADMISSION_MAX_HEAVY_GLOBAL=1,
+                   DATALAKE_ADMISSION_QUEUE_TIMEOUT=0)
+class AdmissionTests(SimpleTestCase):
+    """Seau à jetons sans rafale double, créneaux en baux qui ne dérivent pas"""
+
+    def setUp(self):
+        self.addCleanup(cache.clear)
+        self.controller = AdmissionController()
+        self.user = mock.Mock(pk=1)
+        self.now = 1000.0
+        clock = mock.patch('datalake_api.throttling.time.time', side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def test_bucket_refills_continuously(self):
+        self.controller.admit(self.user, 4).release()
+        self.controller.admit(self.user, 4).release()
+        with self.assertRaises(Throttled) as raised:
+            self.controller.admit(self.user, 4)
+        self.assertEqual(raised.exception.wait, 2)
+        self.now += 2
+        self.controller.admit(self.user, 4).release()
+        # Pas de nouvelle fenêtre pleine : la recharge reste d'une unité par seconde
+        self.now += 1
+        with self.assertRaises(Throttled):
+            self.controller.admit(self.user, 4)
+
+    def test_expired_lease_frees_one_slot_without_drift(self):
+        first = self.controller.admit(self.user, 5)
+        with self.assertRaises(Throttled):
+            self.controller.admit(mock.Mock(pk=2), 5)
+        # Bail expiré alors que la requête tourne encore : le créneau est repris
+        for key in first.slots:
+            cache.delete(key)
+        self.now += 10
+        second = self.controller.admit(mock.Mock(pk=2), 5)
+        first.release()
+        with self.assertRaises(Throttled):
+            self.controller.admit(mock.Mock(pk=3), 5)
+        second.release()
+        self.controller.admit(mock.Mock(pk=3), 5).release()
+        self.assertEqual([key for key in cache._cache if ':admission:heavy:' in key], [])
+
+
+class RetrieveDataAdmissionTests(TestCase):
+    """Les requêtes invalides ou interdites sont refusées avant le contrôle d'admission"""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        with open(os.path.join(self.root, 'secret.jsonl'), 'w', encoding='utf-8') as f:
+            f.write('{"a": 1}\n')
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user('reader'))
+
+    def test_rejected_before_admission(self):
+        with override_settings(DATA_LAKE_ROOT=self.root), \
+                mock.patch('datalake_api.views.admission.admit') as admit:
+            for path, expected in (('missing.jsonl', 404), ('secret.jsonl', 403), ('../etc/passwd', 403)):
+                with self.subTest(path=path):
+                    response = self.client.get('/api/data/', {'path': path})
+                    self.assertEqual(response.status_code, expected)
+        admit.assert_not_called()
+
+
+class FileWatcherTests(SimpleTestCase):
+    """Lignes complètes seulement, offsets alignés, lignes géantes et troncatures signalées"""
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.jsonl')
+        os.close(fd)
+        self.addCleanup(os.remove, self.path)
+        self._append('{"n": 0}\n{"n": 1}\n')
+        self.watcher = FileWatcher(mock.Mock(), self.path)
+
+    def _append(self, text):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(text)
+
+    def _offsets(self, offset, limit=10):
+        return [json.loads(raw)['n'] for _, raw in self.watcher.read(offset, limit)[0]]
+
+    def test_only_complete_lines_are_published(self):
+        self.assertEqual(self.watcher.end, 18)
+        self._append('{"n": 2}\n{"n": ')
+        self.watcher.poll()
+        self.assertEqual(self.watcher.end, 27)
+        self._append('3}\n')
+        self.watcher.poll()
+        self.assertEqual(self._offsets(18), [2, 3])
+
+    def test_offsets_are_aligned_on_the_next_line(self):
+        self._append('{"n": 2}\n{"n": 3}\n')
+        self.watcher.poll()
+        # Sur disque (avant le tampon) puis dans le tampon : un offset en milieu de ligne saute à la suivante
+        for offset, expected in ((0, [0, 1, 2, 3]), (1, [1, 2, 3]), (9, [1, 2, 3]), (10, [2, 3]),
+                                 (18, [2, 3]), (19, [3]), (27, [3]), (30, [])):
+            with self.subTest(offset=offset):
+                self.assertEqual(self._offsets(offset), expected)
+
+    @override_settings(DATALAKE_TAIL_MAX_READ=16)
+    def test_line_longer_than_max_read_does_not_stall(self):
+        self._append(json.dumps({'n': 2, 'pad': 'x' * 100}) + '\n{"n": 3}\n')
+        self.watcher.poll()
+        self.assertEqual(self._offsets(18), [2])
+        self.watcher.poll()
+        self.assertEqual(self._offsets(18), [2, 3])
+        self.assertEqual(self.watcher.end, os.path.getsize(self.path))
+
+    @override_settings(DATALAKE_TAIL_HEARTBEAT=0.01, DATALAKE_TAIL_SSE_MAX_DURATION=60)
+    def test_truncation_ends_the_stream_with_an_error(self):
+        response = TailView()._stream(self.watcher, mock.Mock(), self.watcher.end, 10, None, None)
+        events = iter(response.streaming_content)
+        self.assertTrue(next(events).startswith(b'retry:'))
+        self.assertEqual(next(events), b': keep-alive\n\n')
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write('{"n": 9}\n')
+        self.watcher.poll()
+        event = next(events).decode()
+        self.assertIn('event: error', event)
+        self.assertEqual(json.loads(event.split('data: ', 1)[1])['next_offset'], 9)
+        self.assertEqual(list(events), [])
@@ -0,0 +1,192 @@
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.exceptions import Throttled
+from contextlib import contextmanager
+import math
+import time
+import uuid
+
+MB = 1024 * 1024
+
+
+def estimate_cost(full_path, filters=None, order=None, count_all=True, offset=0, limit=10):
+    """Coût estimé d'une lecture /api/data/, en unités ≈ Mo parcourus
+
+    Une lecture sans filtre ni tri qui s'arrête à la page (count=false) ne parcourt
+    que offset+limit lignes ; un filtre ou un tri implique une passe complète.
+    """
+    try:
+        if full_path.is_dir():
+            return float(settings.DATALAKE_ADMISSION_FOLDER_COST)
+        size_mb = full_path.stat().st_size / MB
+    except OSError:
+        return 1.0
+    if not count_all and not filters and not order:
+        size_mb = min(size_mb, (offset + limit) * settings.DATALAKE_ADMISSION_AVG_ROW_BYTES / MB)
+    cost = size_mb
+    if filters:
+        cost *= settings.DATALAKE_ADMISSION_FILTER_WEIGHT
+    if order:
+        cost *= settings.DATALAKE_ADMISSION_SORT_WEIGHT
+    return 1.0 + cost
+
+
+class Ticket:
+    def __init__(self, controller, slots, cost, waited, owner=None):
+        self.controller = controller
+        self.slots = slots
+        self.cost = cost
+        self.waited = waited
+        self.owner = owner
+        self._released = False
+
+    def renew(self):
+        """Prolonger les créneaux d'un abonnement plus long que DATALAKE_ADMISSION_SLOT_TTL"""
+        if not self._released:
+            self.controller._renew(self)
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.controller._release(self)
+
+
+class AdmissionController:
+    """Contrôle d'admission partagé entre processus via CACHES
+
+    Chaque requête consomme son coût dans le seau à jetons de l'utilisateur : au plus
+    DATALAKE_ADMISSION_BUCKET_CAPACITY unités d'un coup, rechargées de
+    DATALAKE_ADMISSION_REFILL_RATE unités par seconde. Les requêtes lourdes
+    (coût >= DATALAKE_ADMISSION_HEAVY_COST) occupent en plus un créneau limité par
+    utilisateur et globalement ; faute de créneau elles attendent dans une file bornée
+    par DATALAKE_ADMISSION_QUEUE_TIMEOUT. Les requêtes légères ne sont jamais mises en
+    file, ce qui préserve la latence du trafic interactif pendant les exports.
+
+    Un créneau est un bail : une clé numérotée posée avec cache.add au nom du ticket, qui
+    expire après DATALAKE_ADMISSION_SLOT_TTL secondes pour qu'un worker tué ne la garde
+    pas. L'expiration libère exactement un créneau, sans compteur à recaler. Les limites
+    ne sont communes à tous les workers que si CACHES est partagé (Redis, Memcached,
+    base de données) ; avec le LocMemCache par défaut, elles s'appliquent par processus.
+
+    Les abonnements /api/data/tail/ occupent un worker pendant tout le long-poll ou le
+    flux SSE : ils sont plafonnés de la même façon (DATALAKE_TAIL_MAX_SUBSCRIBERS_PER_USER,
+    DATALAKE_TAIL_MAX_SUBSCRIBERS), sans file d'attente.
+    """
+
+    def admit(self, user, cost):
+        if not settings.DATALAKE_ADMISSION_ENABLED:
+            return Ticket(self, [], cost, 0.0)
+
+        user_key = user.pk
+        heavy = cost >= settings.DATALAKE_ADMISSION_HEAVY_COST
+        started = time.monotonic()
+
+        self._charge(user_key, cost)
+
+        owner = uuid.uuid4().hex
+        slots = []
+        if heavy:
+            deadline = started + settings.DATALAKE_ADMISSION_QUEUE_TIMEOUT
+            while True:
+                slots = self._take_slots(self._heavy_slots(user_key), owner)
+                if slots is not None:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise Throttled(
+                        wait=settings.DATALAKE_ADMISSION_RETRY_AFTER,
+                        detail='Trop de requêtes lourdes en cours, réessayez plus tard'
+                    )
+                time.sleep(min(settings.DATALAKE_ADMISSION_POLL_INTERVAL, remaining))
+
+        return Ticket(self, slots, cost, time.monotonic() - started, owner)
+
+    def subscribe(self, user):
+        """Réserver un abonnement au suivi d'un fichier, refusé immédiatement au-delà des plafonds"""
+        if not settings.DATALAKE_ADMISSION_ENABLED:
+            return Ticket(self, [], 0.0, 0.0)
+        owner = uuid.uuid4().hex
+        slots = self._take_slots([
+            ('admission:tail:user:%s' % user.pk, settings.DATALAKE_TAIL_MAX_SUBSCRIBERS_PER_USER),
+            ('admission:tail:global', settings.DATALAKE_TAIL_MAX_SUBSCRIBERS),
+        ], owner)
+        if slots is None:
+            raise Throttled(
+                wait=settings.DATALAKE_ADMISSION_RETRY_AFTER,
+                detail='Trop de suivis de fichiers en cours, réessayez plus tard'
+            )
+        return Ticket(self, slots, 0.0, 0.0, owner)
+
+    def _charge(self, user_key, cost):
+        """Seau à jetons : (jetons, instant) par utilisateur, mis à jour sous verrou"""
+        capacity = settings.DATALAKE_ADMISSION_BUCKET_CAPACITY
+        rate = settings.DATALAKE_ADMISSION_REFILL_RATE
+        key = 'admission:bucket:%s' % user_key
+        # Un coût supérieur à la capacité est plafonné pour rester admissible
+        charge = min(cost, capacity)
+        with _locked('admission:bucket-lock:%s' % user_key):
+            now = time.time()
+            state = cache.get(key)
+            tokens = capacity
+            if state is not None:
+                tokens = min(capacity, state[0] + max(0.0, now - state[1]) * rate)
+            if tokens < charge:
+                raise Throttled(wait=math.ceil((charge - tokens) / rate),
+                                detail='Budget de requêtes dépassé, réessayez plus tard')
+            # Un seau inutilisé le temps d'une recharge complète est plein : la clé peut expirer
+            cache.set(key, (tokens - charge, now), int(math.ceil(capacity / rate)) + 1)
+
+    def _heavy_slots(self, user_key):
+        return [
+            ('admission:heavy:user:%s' % user_key, settings.DATALAKE_ADMISSION_MAX_HEAVY_PER_USER),
+            ('admission:heavy:global', settings.DATALAKE_ADMISSION_MAX_HEAVY_GLOBAL),
+        ]
+
+    def _take_slots(self, slots, owner):
+        """Un bail par plafond, ou None (sans rien garder) si l'un d'eux est atteint"""
+        ttl = settings.DATALAKE_ADMISSION_SLOT_TTL
+        taken = []
+        for prefix, limit in slots:
+            lease = next((key for key in ('%s:%d' % (prefix, index) for index in range(limit))
+                          if cache.add(key, owner, ttl)), None)
+            if lease is None:
+                _free(taken, owner)
+                return None
+            taken.append(lease)
+        return taken
+
+    def _renew(self, ticket):
+        for key in ticket.slots:
+            if cache.get(key) == ticket.owner:
+                cache.touch(key, settings.DATALAKE_ADMISSION_SLOT_TTL)
+
+    def _release(self, ticket):
+        _free(ticket.slots, ticket.owner)
+
+
+def _free(leases, owner):
+    # Un bail expiré puis repris par un autre ticket ne doit pas être libéré à sa place
+    for key in leases:
+        if cache.get(key) == owner:
+            cache.delete(key)
+
+
+@contextmanager
+def _locked(key):
+    ttl = settings.DATALAKE_ADMISSION_LOCK_TTL
+    deadline = time.monotonic() + ttl
+    owner = uuid.uuid4().hex
+    while not cache.add(key, owner, ttl):
+        # Un verrou abandonné expire au bout de son TTL
+        if time.monotonic() > deadline:
+            raise Throttled(wait=settings.DATALAKE_ADMISSION_RETRY_AFTER,
+                            detail='Contrôle d\'admission indisponible, réessayez plus tard')
+        time.sleep(0.005)
+    try:
+        yield
+    finally:
+        if cache.get(key) == owner:
+            cache.delete(key)
+
+
+admission = AdmissionController()
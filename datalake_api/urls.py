@@ -1,11 +1,15 @@
 from django.urls import path
-from .views import GrantPermissionView, RevokePermissionView, ListResourcesView, RetrieveDataView, MoneyLast5MinView, repush_transaction_view, SearchView
+from .views import GrantPermissionView, RevokePermissionView, ListResourcesView, RetrieveDataView, MoneyLast5MinView, repush_transaction_view, SearchView, SchemaView, TailView, TrainingExportView, TrainingExportStatusView
 
 urlpatterns = [
     path('permissions/grant/', GrantPermissionView.as_view(), name='grant'),
     path('permissions/revoke/', RevokePermissionView.as_view(), name='revoke'),
     path('resources/', ListResourcesView.as_view(), name='resources'),
     path('data/', RetrieveDataView.as_view(), name='data'),
+    path('data/tail/', TailView.as_view(), name='data_tail'),
+    path('schema/', SchemaView.as_view(), name='schema'),
+    path('export/training/', TrainingExportView.as_view(), name='export_training'),
+    path('export/training/<uuid:job_id>/', TrainingExportStatusView.as_view(), name='export_training_status'),
     path('metrics/money_last_5min/', MoneyLast5MinView.as_view(), name='money_5min'),
     path('repush/', repush_transaction_view, name='repush'),
     path('search/', SearchView.as_view(), name='search'),
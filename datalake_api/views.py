@@ -2,23 +2,35 @@ from rest_framework.views import APIView
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.utils.urls import replace_query_param
 from rest_framework import permissions, status
+from rest_framework.settings import api_settings
 from django.conf import settings
+from django.http import StreamingHttpResponse
 from django.core.cache import cache
-from django.db.models import Q
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 import os
 import json
-import csv
 import logging
+import time
 from pathlib import Path
 from django.contrib.auth import get_user_model
 
 from .models import (
-    DataLakeResource, PermissionEntry, AuditLog, VersionEntry,
-    DataLakePermission, APIAccessLog, DataLakeFile
+    DataLakeResource, PermissionEntry, AuditLog, VersionEntry, ExportJob
 )
+from .profiling import QueryProfile, profile_requested, should_sample_cprofile, cprofile_dump
+from .readers import RecordReader, SUPPORTED_SUFFIXES
+from .query import compile_filters, filter_records, parse_filters, parse_projection, project
+from .sorting import parse_order_by, top_k, sorted_file, external_sort
+from .partitions import FolderScan
+from .schema import get_schema, cached_column_types
+from .throttling import admission, estimate_cost
+from .permissions import readable_paths
+from .tailing import EventStreamRenderer, watchers, decode_lines, sse_event
+from .exports import parse_export_spec, submit_export, fail_orphaned_jobs
+from .serializers import ExportJobSerializer
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
@@ -32,6 +44,42 @@ class OptimizedPagination(LimitOffsetPagination):
     default_limit = 10
     max_limit = 100
     
+    def paginate_stream(self, iterable, request, count_all=True, total=None):
+        """Paginer un flux sans le matérialiser
+        
+        Seule la page demandée est conservée en mémoire. Avec `count_all=False` la
+        lecture s'arrête dès que la page est complète et `count` vaut None.
+        `total` remplace le décompte quand le flux est déjà tronqué (top-k).
+        """
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.offset = self.get_offset(request)
+        stop = self.offset + self.limit
+        page = []
+        count = 0
+        self.has_more = False
+        for item in iterable:
+            if count >= stop and not count_all:
+                self.has_more = True
+                break
+            if count >= self.offset:
+                if count < stop:
+                    page.append(item)
+            count += 1
+        self.count = count if count_all else None
+        if total is not None:
+            self.count = total
+        return page
+    
+    def get_next_link(self):
+        if self.count is None:
+            if not self.has_more:
+                return None
+            url = self.request.build_absolute_uri()
+            url = replace_query_param(url, self.limit_query_param, self.limit)
+            return replace_query_param(url, self.offset_query_param, self.offset + self.limit)
+        return super().get_next_link()
+    
     def get_paginated_response(self, data):
         return Response({
             'count': self.count,
@@ -40,7 +88,7 @@ class OptimizedPagination(LimitOffsetPagination):
             'page_info': {
                 'current_page': (self.offset // self.limit) + 1 if self.limit else 1,
                 'page_size': self.limit,
-                'total_pages': (self.count + self.limit - 1) // self.limit if self.limit else 1,
+                'total_pages': (self.count + self.limit - 1) // self.limit if self.limit and self.count is not None else None,
             },
             'results': data
         })
@@ -103,17 +151,6 @@ class GrantPermissionView(APIView):
             access=access
         )
         
-        # Aussi créer dans DataLakePermission pour compatibilité
-        DataLakePermission.objects.update_or_create(
-            user=user,
-            resource_type='file',
-            resource_path=resource_path,
-            defaults={
-                'can_read': access == 'read',
-                'can_write': access == 'write',
-            }
-        )
-        
         # Log dans AuditLog
         AuditLog.objects.create(
             user=request.user,
@@ -162,12 +199,6 @@ class RevokePermissionView(APIView):
             resource__path=resource_path
         ).delete()[0]
         
-        # Supprimer de DataLakePermission
-        DataLakePermission.objects.filter(
-            user_id=user_id,
-            resource_path=resource_path
-        ).delete()
-        
         # Log
         AuditLog.objects.create(
             user=request.user,
@@ -187,7 +218,23 @@ class RevokePermissionView(APIView):
 # DATA RETRIEVAL
 # ==========================================
 
-class RetrieveDataView(APIView):
+class DataLakeAccessMixin:
+    """Contrôle d'accès commun aux vues qui lisent le Data Lake"""
+    
+    def _check_permission(self, user, path):
+        """Vérifier les permissions"""
+        if user.is_superuser:
+            return True
+        
+        # Extraire le topic (premier segment)
+        topic = path.split('/')[0] if path else ''
+        
+        # Droits de lecture mis en cache par version de permissions
+        paths = readable_paths(user)
+        return path in paths or topic in paths or '' in paths
+
+
+class RetrieveDataView(DataLakeAccessMixin, APIView):
     """Récupérer les données du Data Lake"""
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = OptimizedPagination
@@ -198,7 +245,12 @@ class RetrieveDataView(APIView):
             openapi.Parameter('browse', openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN, description='Mode navigation'),
             openapi.Parameter('filters', openapi.IN_QUERY, type=openapi.TYPE_STRING, description='Filtres JSON'),
             openapi.Parameter('projection', openapi.IN_QUERY, type=openapi.TYPE_STRING, description='Champs à retourner'),
-        ]
+            openapi.Parameter('order_by', openapi.IN_QUERY, type=openapi.TYPE_STRING, description='Tri, ex: -amount,timestamp'),
+            openapi.Parameter('count', openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN, description='Compter tous les résultats (false = arrêt dès que la page est complète)'),
+            openapi.Parameter('explain', openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN, description='Plan d\'exécution et coût par étape'),
+            openapi.Parameter('profile', openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN, description='Forcer un dump cProfile (superuser)'),
+        ],
+        responses={429: 'Budget dépassé (voir Retry-After)'}
     )
     def get(self, request):
         browse_mode = request.query_params.get('browse', 'false').lower() == 'true'
@@ -213,30 +265,44 @@ class RetrieveDataView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        return self._read_file(request, path)
-    
-    def _check_permission(self, user, path):
-        """Vérifier les permissions"""
-        if user.is_superuser:
-            return True
-        
-        # Extraire le topic (premier segment)
-        topic = path.split('/')[0] if path else ''
+        explain = request.query_params.get('explain', 'false').lower() == 'true'
+        profile = QueryProfile(enabled=explain or profile_requested(request))
         
-        # Chercher dans PermissionEntry
-        resources = DataLakeResource.objects.filter(
-            Q(path=path) | Q(path=topic) | Q(path='')
-        )
+        full_path, error = self._validate(request, path, profile)
+        if error is not None:
+            return error
         
-        for resource in resources:
-            if PermissionEntry.objects.filter(
-                user=user,
-                resource=resource,
-                access='read'
-            ).exists():
-                return True
+        # Contrôle d'admission après validation : un chemin invalide ou interdit ne consomme
+        # ni budget ni créneau. Lève Throttled (429 + Retry-After) si le budget est dépassé
+        ticket = admission.admit(request.user, self._estimate_cost(request, full_path))
+        profile.details['cost'] = round(ticket.cost, 3)
+        profile.details['admission_wait_ms'] = round(ticket.waited * 1000, 3)
+        try:
+            if profile.enabled and should_sample_cprofile(request):
+                with cprofile_dump(profile, request):
+                    response = self._read_file(request, path, full_path, profile)
+            else:
+                response = self._read_file(request, path, full_path, profile)
+        finally:
+            ticket.release()
         
-        return False
+        if profile.enabled:
+            if explain and response.status_code == status.HTTP_200_OK:
+                response.data['explain'] = profile.as_dict()
+            response['Server-Timing'] = profile.server_timing()
+        return response
+    
+    def _estimate_cost(self, request, full_path):
+        """Coût de la requête à partir de la taille du fichier, de l'offset et des filtres"""
+        paginator = self.pagination_class()
+        return estimate_cost(
+            full_path,
+            filters=request.query_params.get('filters'),
+            order=request.query_params.get('order_by'),
+            count_all=request.query_params.get('count', 'true').lower() != 'false',
+            offset=paginator.get_offset(request),
+            limit=paginator.get_limit(request),
+        )
     
     def _browse(self, request, current_path):
         """Mode navigation"""
@@ -285,119 +351,434 @@ class RetrieveDataView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
-    def _read_file(self, request, path):
-        """Lire un fichier"""
+    def _validate(self, request, path, profile):
+        """Chemin, existence, droits et format ; renvoie (chemin résolu, None) ou (None, réponse d'erreur)"""
+        base_path = Path(settings.DATA_LAKE_ROOT)
+        full_path = (base_path / path).resolve()
+        
+        # Sécurité
+        if not str(full_path).startswith(str(base_path)):
+            return None, Response({'error': 'Chemin invalide'}, status=status.HTTP_403_FORBIDDEN)
+        
+        if not full_path.exists():
+            return None, Response({'error': 'Fichier introuvable'}, status=status.HTTP_404_NOT_FOUND)
+        
+        with profile.stage('permission', count_queries=True):
+            allowed = self._check_permission(request.user, path)
+        if not allowed:
+            return None, Response({'error': 'Accès refusé'}, status=status.HTTP_403_FORBIDDEN)
+        
+        if not full_path.is_dir() and full_path.suffix not in SUPPORTED_SUFFIXES:
+            return None, Response({
+                'error': 'Format de fichier non supporté',
+                'supported': ['json', 'jsonl', 'csv']
+            }, status=status.HTTP_400_BAD_REQUEST)
+        return full_path, None
+    
+    def _read_file(self, request, path, full_path, profile):
+        """Lire un fichier déjà validé par _validate"""
         try:
             base_path = Path(settings.DATA_LAKE_ROOT)
-            full_path = base_path / path
-            full_path = full_path.resolve()
+            is_folder = full_path.is_dir()
+            
+            filters = parse_filters(request.query_params.get('filters'))
+            fields = parse_projection(request.query_params.get('projection'))
+            order = parse_order_by(request.query_params.get('order_by'))
+            count_all = request.query_params.get('count', 'true').lower() != 'false'
+            
+            # Un dossier est lu fichier par fichier, avec élagage par partition et zone map
+            if is_folder:
+                make_reader = lambda: FolderScan(full_path, base_path.resolve(), filters)
+                column_types = None
+            else:
+                make_reader = lambda: RecordReader(full_path)
+                column_types = cached_column_types(full_path) if filters else None
+            
+            # Lecture, filtrage et pagination en flux : seule la page est gardée en mémoire
+            paginator = self.pagination_class()
+            if order:
+                with profile.stage('sort'):
+                    result, reader = self._read_sorted(
+                        full_path, make_reader, filters, order, paginator, request, count_all, profile,
+                        column_types=column_types
+                    )
+            else:
+                with profile.stage('scan'):
+                    reader = make_reader()
+                    records = filter_records(iter(reader), filters, column_types)
+                    result = paginator.paginate_stream(records, request, count_all=count_all)
+                profile.plan = 'full_scan' if count_all else 'early_termination'
+            profile.details['format'] = reader.format
+            profile.rows_scanned = reader.rows_scanned
+            profile.bytes_read = reader.bytes_read
+            if is_folder:
+                profile.details.update(reader.pruning_stats())
+            
+            # Projection appliquée à la page seulement
+            if fields:
+                with profile.stage('projection'):
+                    result = project(result, fields)
+            profile.rows_returned = len(result)
+            
+            if is_folder:
+                file_info = {'path': path, 'type': 'folder', 'files': reader.files_total}
+            else:
+                file_info = {'path': path, 'size': full_path.stat().st_size}
+            
+            return paginator.get_paginated_response({
+                'file_info': file_info,
+                'data': result
+            })
+        
+        except Exception as e:
+            logger.error(f"Read file error: {e}")
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+    
+    def _read_sorted(self, full_path, make_reader, filters, order, paginator, request, count_all, profile,
+                     column_types=None):
+        """Tri côté serveur : top-k en tas pour les premières pages, tri externe au-delà"""
+        wanted = paginator.get_offset(request) + paginator.get_limit(request)
+        
+        if wanted <= settings.DATALAKE_TOPK_THRESHOLD:
+            reader = make_reader()
+            matched = [0]
+            
+            def counted(records):
+                for record in records:
+                    matched[0] += 1
+                    yield record
+            
+            top = top_k(counted(filter_records(iter(reader), filters, column_types)), order, wanted)
+            profile.plan = 'top_k'
+            return paginator.paginate_stream(top, request, total=matched[0]), reader
+        
+        # Pas de cache pour un dossier : on filtre avant de trier pour réduire les runs
+        if full_path.is_dir():
+            reader = make_reader()
+            os.makedirs(settings.DATALAKE_SORT_CACHE_DIR, exist_ok=True)
+            records = external_sort(
+                filter_records(iter(reader), filters), order,
+                settings.DATALAKE_SORT_RUN_SIZE, settings.DATALAKE_SORT_CACHE_DIR
+            )
+            profile.plan = 'external_sort'
+            return paginator.paginate_stream(records, request, count_all=count_all), reader
+        
+        # Le fichier trié (non filtré) est mis en cache par version et clé de tri
+        path, hit = sorted_file(full_path, order)
+        profile.plan = 'sorted_cache' if hit else 'external_sort'
+        reader = RecordReader(path)
+        records = filter_records(iter(reader), filters, column_types)
+        return paginator.paginate_stream(records, request, count_all=count_all), reader
+
+
+class SchemaView(DataLakeAccessMixin, APIView):
+    """Schéma inféré et statistiques de colonnes d'un fichier"""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('path', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=True, description='Chemin fichier'),
+            openapi.Parameter('full', openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN, description='Passe complète même sur un gros fichier'),
+        ],
+        responses={200: 'Schéma et statistiques', 404: 'Fichier introuvable'}
+    )
+    def get(self, request):
+        path = request.query_params.get('path', '').strip()
+        if not path:
+            return Response(
+                {'error': 'Paramètre "path" requis'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            base_path = Path(settings.DATA_LAKE_ROOT)
+            full_path = (base_path / path).resolve()
             
             # Sécurité
             if not str(full_path).startswith(str(base_path)):
                 return Response({'error': 'Chemin invalide'}, status=status.HTTP_403_FORBIDDEN)
             
-            if not full_path.exists():
+            if not full_path.is_file():
                 return Response({'error': 'Fichier introuvable'}, status=status.HTTP_404_NOT_FOUND)
             
             if not self._check_permission(request.user, path):
                 return Response({'error': 'Accès refusé'}, status=status.HTTP_403_FORBIDDEN)
             
-            # Lire le contenu
-            data = []
-            if full_path.suffix in ['.json', '.jsonl']:
-                with open(full_path, 'r', encoding='utf-8') as f:
-                    try:
-                        obj = json.load(f)
-                        data = obj if isinstance(obj, list) else [obj]
-                    except json.JSONDecodeError:
-                        f.seek(0)
-                        for line in f:
-                            if line.strip():
-                                try:
-                                    data.append(json.loads(line))
-                                except:
-                                    pass
-            elif full_path.suffix == '.csv':
-                with open(full_path, 'r', encoding='utf-8') as f:
-                    reader = csv.DictReader(f)
-                    data = list(reader)
-            else:
+            if full_path.suffix not in SUPPORTED_SUFFIXES:
                 return Response({
                     'error': 'Format de fichier non supporté',
                     'supported': ['json', 'jsonl', 'csv']
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            # Appliquer filtres si présents
-            filters_json = request.query_params.get('filters')
-            if filters_json:
-                try:
-                    filters = json.loads(filters_json)
-                    data = self._apply_filters(data, filters)
-                except:
-                    pass
+            full = request.query_params.get('full', 'false').lower() == 'true'
+            schema, cached = get_schema(full_path, full=full)
             
-            # Appliquer projection si présente
-            projection = request.query_params.get('projection')
-            if projection:
-                fields = [f.strip() for f in projection.split(',')]
-                data = [{k: v for k, v in item.items() if k in fields} for item in data]
-            
-            # Pagination
-            paginator = self.pagination_class()
-            result = paginator.paginate_queryset(data, request)
-            
-            return paginator.get_paginated_response({
-                'file_info': {
-                    'path': path,
-                    'size': full_path.stat().st_size
-                },
-                'data': result
-            })
+            return Response(dict(schema, path=path, size=full_path.stat().st_size, cached=cached))
         
         except Exception as e:
-            logger.error(f"Read file error: {e}")
+            logger.error(f"Schema error: {e}")
             return Response(
                 {'error': str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+
+class TailView(DataLakeAccessMixin, APIView):
+    """Enregistrements ajoutés à un fichier JSONL après un offset (long-poll ou SSE)"""
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = list(api_settings.DEFAULT_RENDERER_CLASSES) + [EventStreamRenderer]
     
-    def _apply_filters(self, data, filters):
-        """Appliquer des filtres"""
-        def matches(item):
-            for field, condition in filters.items():
-                if field not in item:
-                    return False
-                
-                value = item[field]
-                
-                if not isinstance(condition, dict):
-                    if str(value) != str(condition):
-                        return False
-                    continue
-                
-                for op, target in condition.items():
-                    if op == 'eq' and str(value) != str(target):
-                        return False
-                    elif op == 'gt':
-                        try:
-                            if not (float(value) > float(target)):
-                                return False
-                        except:
-                            return False
-                    elif op == 'lt':
-                        try:
-                            if not (float(value) < float(target)):
-                                return False
-                        except:
-                            return False
-                    elif op == 'in' and value not in target:
-                        return False
-                    elif op == 'contains' and target not in str(value):
-                        return False
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('path', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=True, description='Chemin fichier JSONL'),
+            openapi.Parameter('from_offset', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description='Offset en octets (défaut : fin du fichier)'),
+            openapi.Parameter('wait', openapi.IN_QUERY, type=openapi.TYPE_NUMBER, description='Long-poll : secondes d\'attente maximale'),
+            openapi.Parameter('limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description='Nombre maximal de lignes lues'),
+            openapi.Parameter('filters', openapi.IN_QUERY, type=openapi.TYPE_STRING, description='Filtres JSON'),
+            openapi.Parameter('projection', openapi.IN_QUERY, type=openapi.TYPE_STRING, description='Champs à retourner'),
+            openapi.Parameter('format', openapi.IN_QUERY, type=openapi.TYPE_STRING, description='sse pour un flux Server-Sent Events'),
+        ],
+        responses={200: 'Nouveaux enregistrements et next_offset', 416: 'Offset au-delà de la fin du fichier', 429: 'Trop de suivis en cours (voir Retry-After)'}
+    )
+    def get(self, request):
+        path = request.query_params.get('path', '').strip()
+        if not path:
+            return Response(
+                {'error': 'Paramètre "path" requis'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        base_path = Path(settings.DATA_LAKE_ROOT)
+        full_path = (base_path / path).resolve()
+        
+        # Sécurité
+        if not str(full_path).startswith(str(base_path)):
+            return Response({'error': 'Chemin invalide'}, status=status.HTTP_403_FORBIDDEN)
+        
+        if not full_path.is_file():
+            return Response({'error': 'Fichier introuvable'}, status=status.HTTP_404_NOT_FOUND)
+        
+        if not self._check_permission(request.user, path):
+            return Response({'error': 'Accès refusé'}, status=status.HTTP_403_FORBIDDEN)
+        
+        if full_path.suffix != '.jsonl':
+            return Response({
+                'error': 'Seuls les fichiers JSONL peuvent être suivis',
+                'supported': ['jsonl']
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        sse = request.accepted_renderer.format == 'sse'
+        try:
+            # Reconnexion SSE : le navigateur renvoie le dernier id reçu
+            raw_offset = request.META.get('HTTP_LAST_EVENT_ID') if sse else None
+            raw_offset = raw_offset or request.query_params.get('from_offset')
+            offset = int(raw_offset) if raw_offset not in (None, '') else None
+            limit = int(request.query_params.get('limit', settings.DATALAKE_TAIL_DEFAULT_LIMIT))
+            wait = float(request.query_params.get('wait', 0))
+        except ValueError:
+            return Response(
+                {'error': 'from_offset, limit et wait doivent être numériques'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if (offset is not None and offset < 0) or limit < 1:
+            return Response(
+                {'error': 'from_offset doit être positif et limit supérieur à 0'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limit = min(limit, settings.DATALAKE_TAIL_MAX_LIMIT)
+        wait = max(0.0, min(wait, settings.DATALAKE_TAIL_MAX_WAIT))
+        
+        size = full_path.stat().st_size
+        if offset is not None and offset > size:
+            return Response({
+                'error': 'from_offset au-delà de la fin du fichier (tronqué ou remplacé ?)',
+                'size': size
+            }, status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        
+        filters = parse_filters(request.query_params.get('filters'))
+        predicate = compile_filters(filters) if filters else None
+        fields = parse_projection(request.query_params.get('projection'))
+        
+        # Chaque abonné occupe un worker : plafonds par utilisateur et global (429 au-delà)
+        ticket = admission.subscribe(request.user)
+        try:
+            watcher = watchers.subscribe(full_path)
+        except BaseException:
+            ticket.release()
+            raise
+        if offset is None:
+            offset = watcher.end
+        if sse:
+            return self._stream(watcher, ticket, offset, limit, predicate, fields)
+        
+        try:
+            records, next_offset, has_more = self._batch(watcher, offset, limit, predicate, fields)
+            deadline = time.monotonic() + wait
+            # Long-poll : attendre des lignes ; celles écartées par les filtres font avancer l'offset
+            while not records and not has_more:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not watcher.wait(next_offset, remaining):
+                    break
+                records, next_offset, has_more = self._batch(watcher, next_offset, limit, predicate, fields)
+        except FileNotFoundError:
+            return Response({'error': 'Fichier introuvable'}, status=status.HTTP_404_NOT_FOUND)
+        finally:
+            watchers.unsubscribe(watcher)
+            ticket.release()
+        
+        return Response({
+            'file_info': {'path': path, 'size': full_path.stat().st_size},
+            'from_offset': offset,
+            'next_offset': next_offset,
+            'has_more': has_more,
+            'count': len(records),
+            'data': records,
+        })
+    
+    def _batch(self, watcher, offset, limit, predicate, fields):
+        """Lire au plus `limit` lignes : (enregistrements, prochain offset, reste-t-il des lignes)"""
+        lines, end = watcher.read(offset, limit)
+        next_offset = lines[-1][0] if lines else max(offset, end)
+        records = decode_lines(lines)
+        if predicate is not None:
+            records = [record for record in records if predicate(record)]
+        if fields:
+            records = project(records, fields)
+        return records, next_offset, next_offset < end
+    
+    def _stream(self, watcher, ticket, offset, limit, predicate, fields):
+        """Flux SSE borné dans le temps ; chaque événement porte l'offset suivant en id"""
+        def events():
+            current = offset
+            generation = watcher.generation
+            try:
+                yield 'retry: %d\n\n' % settings.DATALAKE_TAIL_SSE_RETRY_MS
+                deadline = time.monotonic() + settings.DATALAKE_TAIL_SSE_MAX_DURATION
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    if watcher.generation != generation:
+                        # Fichier tronqué ou remplacé : l'offset ne vaut plus rien, comme le 416 du long-poll
+                        yield sse_event({
+                            'error': 'Fichier tronqué ou remplacé, reprendre depuis next_offset',
+                            'next_offset': watcher.end
+                        }, event='error')
+                        break
+                    previous = current
+                    records, current, has_more = self._batch(watcher, current, limit, predicate, fields)
+                    if records:
+                        yield sse_event(records, event='records', event_id=current)
+                    elif current != previous:
+                        # Lignes écartées par les filtres : avancer Last-Event-ID sans événement
+                        yield 'id: %d\n\n' % current
+                    if has_more:
+                        continue
+                    if not watcher.wait(current, min(settings.DATALAKE_TAIL_HEARTBEAT, remaining)):
+                        ticket.renew()
+                        yield ': keep-alive\n\n'
+            except OSError as e:
+                yield sse_event({'error': str(e)}, event='error', event_id=current)
+            finally:
+                watchers.unsubscribe(watcher)
+                ticket.release()
+        
+        response = StreamingHttpResponse(events(), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+# ==========================================
+# TRAINING EXPORT
+# ==========================================
+
+class TrainingExportView(DataLakeAccessMixin, APIView):
+    """Lancer un export de données d'entraînement (job en arrière-plan)"""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    @swagger_auto_schema(
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'paths': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_STRING)),
+                'filters': openapi.Schema(type=openapi.TYPE_OBJECT),
+                'projection': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_STRING)),
+                'sample': openapi.Schema(type=openapi.TYPE_OBJECT, description='{"method": "reservoir"|"stratified", "size": N, "column": "..."} ; size par strate en stratifié'),
+                'seed': openapi.Schema(type=openapi.TYPE_INTEGER),
+                'shuffle': openapi.Schema(type=openapi.TYPE_BOOLEAN),
+                'validation_split': openapi.Schema(type=openapi.TYPE_NUMBER),
+                'format': openapi.Schema(type=openapi.TYPE_STRING, description='ndjson ou parquet (pyarrow)'),
+                'shard_rows': openapi.Schema(type=openapi.TYPE_INTEGER),
+            },
+            required=['paths']
+        ),
+        responses={202: 'Job créé', 400: 'Paramètres invalides', 429: 'Trop de jobs en cours'}
+    )
+    def post(self, request):
+        try:
+            spec = parse_export_spec(request.data)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        base_path = Path(settings.DATA_LAKE_ROOT)
+        for path in spec['paths']:
+            full_path = (base_path / path).resolve()
             
-            return True
+            # Sécurité
+            if not str(full_path).startswith(str(base_path)):
+                return Response({'error': 'Chemin invalide', 'path': path}, status=status.HTTP_403_FORBIDDEN)
+            
+            if not full_path.exists():
+                return Response({'error': 'Chemin introuvable', 'path': path}, status=status.HTTP_404_NOT_FOUND)
+            
+            if not self._check_permission(request.user, path):
+                return Response({'error': 'Accès refusé', 'path': path}, status=status.HTTP_403_FORBIDDEN)
+            
+            if full_path.is_file() and full_path.suffix not in SUPPORTED_SUFFIXES:
+                return Response({
+                    'error': 'Format de fichier non supporté',
+                    'path': path,
+                    'supported': ['json', 'jsonl', 'csv']
+                }, status=status.HTTP_400_BAD_REQUEST)
         
-        return [item for item in data if matches(item)]
+        fail_orphaned_jobs(ExportJob.objects.filter(user=request.user))
+        active = ExportJob.objects.filter(
+            user=request.user, status__in=[ExportJob.PENDING, ExportJob.RUNNING]
+        ).count()
+        if active >= settings.DATALAKE_EXPORT_MAX_ACTIVE_PER_USER:
+            return Response(
+                {'error': 'Trop d\'exports en cours pour cet utilisateur'},
+                status=status.HTTP_429_TOO_MANY_REQUESTS
+            )
+        
+        job = ExportJob(user=request.user, spec=spec)
+        job.output_dir = os.path.join(settings.DATALAKE_EXPORT_DIR, str(job.pk))
+        job.save()
+        submit_export(job)
+        
+        return Response(ExportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+class TrainingExportStatusView(APIView):
+    """Progression d'un export de données d'entraînement"""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    @swagger_auto_schema(
+        responses={200: 'État du job', 404: 'Job introuvable'}
+    )
+    def get(self, request, job_id):
+        jobs = ExportJob.objects.all()
+        if not request.user.is_superuser:
+            jobs = jobs.filter(user=request.user)
+        fail_orphaned_jobs(jobs.filter(pk=job_id))
+        job = jobs.filter(pk=job_id).first()
+        if job is None:
+            return Response({'error': 'Job introuvable'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(ExportJobSerializer(job).data)
 
 
 # ==========================================
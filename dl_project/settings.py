@@ -53,13 +53,58 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'dl_project.wsgi.application'
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.getenv('DATA_WAREHOUSE_DB', str(BASE_DIR.parent / 'kafka_project_pipeline' / 'data_warehouse.db')),
+# Profil de base de données : 'sqlite' (défaut, WAL + busy timeout) ou 'postgres'
+DATALAKE_DB_PROFILE = os.getenv('DATALAKE_DB_PROFILE', 'sqlite')
+
+if DATALAKE_DB_PROFILE == 'postgres':
+    _postgres = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'HOST': os.getenv('POSTGRES_HOST', 'localhost'),
+        'PORT': os.getenv('POSTGRES_PORT', '5432'),
+        'USER': os.getenv('POSTGRES_USER', 'datalake'),
+        'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
+        # Connexions persistantes, vérifiées avant réutilisation
+        'CONN_MAX_AGE': int(os.getenv('POSTGRES_CONN_MAX_AGE', '600')),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'connect_timeout': 5},
+    }
+    if os.getenv('POSTGRES_POOL', 'False') == 'True':
+        # Pool natif de Django >= 5.1, nécessite psycopg 3 (incompatible avec CONN_MAX_AGE)
+        _postgres['CONN_MAX_AGE'] = 0
+        _postgres['OPTIONS']['pool'] = {
+            'min_size': int(os.getenv('POSTGRES_POOL_MIN', '2')),
+            'max_size': int(os.getenv('POSTGRES_POOL_MAX', '10')),
+        }
+    DATABASES = {
+        'default': dict(_postgres, NAME=os.getenv('POSTGRES_DB', 'data_warehouse')),
     }
+    if os.getenv('POSTGRES_AUDIT_DB'):
+        DATABASES['audit'] = dict(_postgres, NAME=os.getenv('POSTGRES_AUDIT_DB'))
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('DATA_WAREHOUSE_DB', str(BASE_DIR.parent / 'kafka_project_pipeline' / 'data_warehouse.db')),
+            'OPTIONS': {'timeout': 20},
+        }
+    }
+    if os.getenv('DATALAKE_AUDIT_DB'):
+        DATABASES['audit'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('DATALAKE_AUDIT_DB'),
+            'OPTIONS': {'timeout': 20},
+        }
+
+# Pragmas appliqués à chaque connexion SQLite (voir datalake_api.signals)
+DATALAKE_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,
 }
 
+# AuditLog est écrit dans la base 'audit' quand elle est configurée
+DATABASE_ROUTERS = ['datalake_api.routers.AuditLogRouter']
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -75,7 +120,7 @@ STATIC_URL = '/static/'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'datalake_api.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -87,6 +132,7 @@ REST_FRAMEWORK = {
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=2),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
+    'TOKEN_OBTAIN_SERIALIZER': 'datalake_api.authentication.DataLakeTokenObtainPairSerializer',
 }
 
 DATA_LAKE_ROOT = os.getenv('DATA_LAKE_ROOT', str(BASE_DIR.parent / 'kafka_project_pipeline'))
@@ -105,4 +151,121 @@ SWAGGER_SETTINGS = {
 
 REDOC_SETTINGS = {
     'LAZY_RENDERING': True,
-}
\ No newline at end of file
+}
+
+# Profilage des requêtes /api/data/ (?explain=true ou en-tête X-DataLake-Profile)
+DATALAKE_PROFILE_USERS = [u for u in os.getenv('DATALAKE_PROFILE_USERS', '').split(',') if u]
+DATALAKE_PROFILE_SAMPLE_RATE = float(os.getenv('DATALAKE_PROFILE_SAMPLE_RATE', '0.0'))
+DATALAKE_PROFILE_DIR = os.getenv('DATALAKE_PROFILE_DIR', str(BASE_DIR / 'profiles'))
+
+# Lecture en flux des fichiers du data lake
+DATALAKE_READ_CHUNK_SIZE = int(os.getenv('DATALAKE_READ_CHUNK_SIZE', str(1024 * 1024)))
+DATALAKE_USE_MMAP = os.getenv('DATALAKE_USE_MMAP', 'False') == 'True'
+
+# Tri côté serveur (?order_by=) : top-k en mémoire jusqu'à offset+limit, tri externe au-delà
+DATALAKE_TOPK_THRESHOLD = int(os.getenv('DATALAKE_TOPK_THRESHOLD', '10000'))
+DATALAKE_SORT_RUN_SIZE = int(os.getenv('DATALAKE_SORT_RUN_SIZE', '50000'))
+DATALAKE_SORT_CACHE_DIR = os.getenv('DATALAKE_SORT_CACHE_DIR', str(BASE_DIR / 'cache' / 'sorted'))
+DATALAKE_SORT_CACHE_MAX_BYTES = int(os.getenv('DATALAKE_SORT_CACHE_MAX_BYTES', str(2 * 1024 * 1024 * 1024)))
+
+# Zone maps (min/max par fichier) stockées dans le cache 'metadata' : une entrée par fichier, remplacée à chaque version
+DATALAKE_ZONEMAP_TIMEOUT = int(os.getenv('DATALAKE_ZONEMAP_TIMEOUT', str(7 * 24 * 3600)))
+
+# Schéma et statistiques de colonnes (/api/schema/) : une entrée de cache par fichier, remplacée à chaque version
+DATALAKE_SCHEMA_SAMPLE_THRESHOLD = int(os.getenv('DATALAKE_SCHEMA_SAMPLE_THRESHOLD', str(256 * 1024 * 1024)))
+DATALAKE_SCHEMA_SAMPLE_ROWS = int(os.getenv('DATALAKE_SCHEMA_SAMPLE_ROWS', '100000'))
+DATALAKE_SCHEMA_SAMPLE_BLOCKS = 100
+DATALAKE_SCHEMA_RESERVOIR_SIZE = 4096
+DATALAKE_SCHEMA_HISTOGRAM_BINS = 20
+DATALAKE_SCHEMA_CACHE_TIMEOUT = int(os.getenv('DATALAKE_SCHEMA_CACHE_TIMEOUT', str(7 * 24 * 3600)))
+
+# Cache partagé entre workers : Redis si REDIS_URL est défini, sinon LocMemCache, propre à chaque processus.
+# 'default' garde les petites clés vitales (admission, permissions) ; 'metadata' reçoit les zone maps et
+# schémas, nombreux, pour que leur éviction ne chasse pas les compteurs.
+DATALAKE_METADATA_CACHE_MAX_ENTRIES = int(os.getenv('DATALAKE_METADATA_CACHE_MAX_ENTRIES', '20000'))
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        },
+        'metadata': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+            'KEY_PREFIX': 'metadata',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        'metadata': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'metadata',
+            'OPTIONS': {'MAX_ENTRIES': DATALAKE_METADATA_CACHE_MAX_ENTRIES},
+        },
+    }
+
+# Contrôle d'admission de /api/data/, partagé via CACHES : seau à jetons par utilisateur (capacité, recharge
+# par seconde) et créneaux de requêtes lourdes. Le coût vaut environ 1 + Mo parcourus.
+DATALAKE_ADMISSION_ENABLED = os.getenv('DATALAKE_ADMISSION_ENABLED', 'True') == 'True'
+DATALAKE_ADMISSION_BUCKET_CAPACITY = float(os.getenv('DATALAKE_ADMISSION_BUCKET_CAPACITY', '2000'))
+DATALAKE_ADMISSION_REFILL_RATE = float(os.getenv('DATALAKE_ADMISSION_REFILL_RATE', '100'))
+DATALAKE_ADMISSION_HEAVY_COST = float(os.getenv('DATALAKE_ADMISSION_HEAVY_COST', '50'))
+DATALAKE_ADMISSION_MAX_HEAVY_PER_USER = int(os.getenv('DATALAKE_ADMISSION_MAX_HEAVY_PER_USER', '1'))
+DATALAKE_ADMISSION_MAX_HEAVY_GLOBAL = int(os.getenv('DATALAKE_ADMISSION_MAX_HEAVY_GLOBAL', '2'))
+DATALAKE_ADMISSION_QUEUE_TIMEOUT = float(os.getenv('DATALAKE_ADMISSION_QUEUE_TIMEOUT', '5'))
+DATALAKE_ADMISSION_POLL_INTERVAL = 0.1
+DATALAKE_ADMISSION_SLOT_TTL = 600
+DATALAKE_ADMISSION_LOCK_TTL = 2
+DATALAKE_ADMISSION_RETRY_AFTER = 5
+DATALAKE_ADMISSION_FOLDER_COST = 100
+DATALAKE_ADMISSION_AVG_ROW_BYTES = 512
+DATALAKE_ADMISSION_FILTER_WEIGHT = 1.5
+DATALAKE_ADMISSION_SORT_WEIGHT = 3
+
+# Authentification JWT sans requête SQL : identité et droits lus dans les claims du jeton.
+# Les invalidations passent par CACHES, qui doit être partagé entre processus (check datalake_api.E001) ;
+# avec un cache local, l'utilisateur est relu en base à chaque requête.
+DATALAKE_STATELESS_AUTH = os.getenv('DATALAKE_STATELESS_AUTH', 'False') == 'True'
+DATALAKE_AUTH_USER_CACHE_TTL = int(os.getenv('DATALAKE_AUTH_USER_CACHE_TTL', '300'))
+DATALAKE_AUTH_USER_CACHE_SIZE = 1024
+DATALAKE_PERMISSION_CACHE_TIMEOUT = 3600
+DATALAKE_PERMISSION_VERSION_TIMEOUT = int(os.getenv('DATALAKE_PERMISSION_VERSION_TIMEOUT', '300'))
+
+# Suivi des fichiers JSONL en croissance (/api/data/tail/) : un watcher partagé par fichier et par processus
+DATALAKE_TAIL_POLL_INTERVAL = float(os.getenv('DATALAKE_TAIL_POLL_INTERVAL', '0.5'))
+DATALAKE_TAIL_BUFFER_LINES = int(os.getenv('DATALAKE_TAIL_BUFFER_LINES', '10000'))
+DATALAKE_TAIL_MAX_READ = 4 * 1024 * 1024
+DATALAKE_TAIL_IDLE_TIMEOUT = 30
+DATALAKE_TAIL_DEFAULT_LIMIT = 100
+DATALAKE_TAIL_MAX_LIMIT = 1000
+DATALAKE_TAIL_MAX_WAIT = float(os.getenv('DATALAKE_TAIL_MAX_WAIT', '30'))
+DATALAKE_TAIL_SSE_MAX_DURATION = int(os.getenv('DATALAKE_TAIL_SSE_MAX_DURATION', '300'))
+DATALAKE_TAIL_SSE_RETRY_MS = 2000
+DATALAKE_TAIL_HEARTBEAT = 15
+# Abonnements simultanés (long-poll et SSE occupent chacun un worker), via le contrôle d'admission
+DATALAKE_TAIL_MAX_SUBSCRIBERS_PER_USER = int(os.getenv('DATALAKE_TAIL_MAX_SUBSCRIBERS_PER_USER', '2'))
+DATALAKE_TAIL_MAX_SUBSCRIBERS = int(os.getenv('DATALAKE_TAIL_MAX_SUBSCRIBERS', '8'))
+
+# Exports de données d'entraînement (/api/export/training/) : jobs en threads, écriture par un pool de processus
+DATALAKE_EXPORT_DIR = os.getenv('DATALAKE_EXPORT_DIR', str(BASE_DIR / 'exports'))
+DATALAKE_EXPORT_MAX_JOBS = int(os.getenv('DATALAKE_EXPORT_MAX_JOBS', '2'))
+DATALAKE_EXPORT_MAX_ACTIVE_PER_USER = 2
+DATALAKE_EXPORT_WRITER_PROCESSES = int(os.getenv('DATALAKE_EXPORT_WRITER_PROCESSES', '2'))
+DATALAKE_EXPORT_SHARD_ROWS = 100000
+DATALAKE_EXPORT_MAX_SHARD_ROWS = 1000000
+DATALAKE_EXPORT_MAX_SAMPLE_ROWS = 1000000
+DATALAKE_EXPORT_MAX_STRATA = 10000
+DATALAKE_EXPORT_SHUFFLE_BUCKETS = 64
+DATALAKE_EXPORT_SHUFFLE_MEMORY_ROWS = int(os.getenv('DATALAKE_EXPORT_SHUFFLE_MEMORY_ROWS', '200000'))
+DATALAKE_EXPORT_PROGRESS_INTERVAL = 1.0
+# Un job actif sans heartbeat depuis STALE_AFTER secondes est marqué en échec (processus arrêté)
+DATALAKE_EXPORT_HEARTBEAT_INTERVAL = 30
+DATALAKE_EXPORT_STALE_AFTER = 180
+
+# Compaction des petits fichiers JSONL (manage.py compact_datalake)
+DATALAKE_COMPACT_SMALL_FILE_BYTES = int(os.getenv('DATALAKE_COMPACT_SMALL_FILE_BYTES', str(8 * 1024 * 1024)))
+DATALAKE_COMPACT_TARGET_BYTES = int(os.getenv('DATALAKE_COMPACT_TARGET_BYTES', str(128 * 1024 * 1024)))
+DATALAKE_COMPACT_MIN_AGE = int(os.getenv('DATALAKE_COMPACT_MIN_AGE', '300'))